@@ -0,0 +1,110 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from .atomic_io import dump_json
+from .lot_index import detect_binding
+
+
+BINDING_NAMES = {
+	"with": "с привязкой",
+	"without": "без привязки",
+	"lost": "с утерянной привязкой",
+	"any": "любого типа",
+}
+
+
+@dataclass
+class WatchRule:
+	"""Правило наблюдения: лот категории дешевле max_price (для валюты — за 1кк)"""
+
+	id: int
+	category: int
+	max_price: float
+	tier: Optional[str] = None
+	binding: str = "any"
+	server: Optional[str] = None
+
+	def matches(self, lot: dict) -> bool:
+		if lot["price"] > self.max_price:
+			return False
+		if self.server and (lot.get("server") or "").lower() not in ("", self.server.lower()):
+			return False
+		if self.tier and lot.get("tier") != self.tier:
+			return False
+		if self.binding != "any" and detect_binding(lot.get("description") or "") != self.binding:
+			return False
+		return True
+
+	def describe(self) -> str:
+		if self.category == 1596:
+			server = f" {self.server}" if self.server else ""
+			return f"#{self.id} Валюта{server} дешевле {self.max_price:g} ₽ за 1кк"
+		tier = self.tier.capitalize() if self.tier else "Любой донат"
+		return f"#{self.id} {tier} {BINDING_NAMES.get(self.binding, self.binding)} дешевле {self.max_price:g} ₽"
+
+
+class AlertWatcher:
+	"""Проверяет правила только по новым и переоценённым лотам из разницы снимков"""
+
+	def __init__(self, path: str) -> None:
+		self._path = path
+		self._rules: Dict[int, WatchRule] = {}
+		self._by_category: Dict[int, List[WatchRule]] = {}
+		self._load()
+
+	@property
+	def rules(self) -> List[WatchRule]:
+		return sorted(self._rules.values(), key=lambda r: r.id)
+
+	def _reindex(self) -> None:
+		self._by_category = {}
+		for rule in self._rules.values():
+			self._by_category.setdefault(rule.category, []).append(rule)
+
+	def _load(self) -> None:
+		try:
+			if os.path.exists(self._path):
+				with open(self._path, "r", encoding="utf-8") as f:
+					self._rules = {r["id"]: WatchRule(**r) for r in json.load(f)}
+				self._reindex()
+		except Exception as e:
+			print(f"[Alerts] Ошибка загрузки правил: {e}")
+
+	def save(self) -> None:
+		try:
+			dump_json(self._path, [asdict(r) for r in self.rules], ensure_ascii=False, indent=2)
+		except Exception as e:
+			print(f"[Alerts] Ошибка сохранения правил: {e}")
+
+	def add(self, category: int, max_price: float, tier: Optional[str] = None, binding: str = "any", server: Optional[str] = None) -> WatchRule:
+		rule = WatchRule(id=max(self._rules, default=0) + 1, category=category, max_price=max_price, tier=tier, binding=binding, server=server)
+		self._rules[rule.id] = rule
+		self._reindex()
+		self.save()
+		return rule
+
+	def remove(self, rule_id: int) -> bool:
+		if self._rules.pop(rule_id, None) is None:
+			return False
+		self._reindex()
+		self.save()
+		return True
+
+	def evaluate(self, category: int, diff: dict) -> List[Tuple[WatchRule, dict]]:
+		"""Совпадения правил с новыми лотами и лотами, подешевевшими ниже порога"""
+		rules = self._by_category.get(category)
+		if not rules:
+			return []
+		hits = []
+		for lot in diff.get("new", []):
+			for rule in rules:
+				if rule.matches(lot):
+					hits.append((rule, lot))
+		for lot in diff.get("changed", []):
+			for rule in rules:
+				# Лот уже был ниже порога — о нём сообщали раньше
+				if lot["old_price"] > rule.max_price and rule.matches(lot):
+					hits.append((rule, lot))
+		return hits
@@ -0,0 +1,11 @@
+import json
+import os
+
+
+def dump_json(path: str, data, **kwargs) -> None:
+	"""Атомарная запись JSON: временный файл и os.replace, чтобы обрыв не оставил половину файла"""
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	tmp = path + ".tmp"
+	with open(tmp, "w", encoding="utf-8") as f:
+		json.dump(data, f, **kwargs)
+	os.replace(tmp, path)
@@ -22,6 +22,14 @@ def _env_int(name: str, default: int) -> int:
 		return default
 
 
+def _env_float(name: str, default: float) -> float:
+	value = os.getenv(name)
+	try:
+		return float(value) if value is not None else default
+	except ValueError:
+		return default
+
+
 @dataclass
 class AppConfig:
 	funpay_base_url: str = os.getenv("FUNPAY_BASE_URL", "https://funpay.com/")
@@ -32,6 +40,14 @@ class AppConfig:
 	post_interval_minutes: int = _env_int("POST_INTERVAL_MINUTES", 5)
 	services_interval: int = _env_int("SERVICES_INTERVAL", 5)  # Интервал для услуг в секундах
 	headless: bool = _env_bool("HEADLESS", True)
+	# Подключение к долгоживущему браузеру (scripts/browser_daemon.py), например http://127.0.0.1:9222
+	browser_cdp_url: str = os.getenv("BROWSER_CDP_URL", "")
+	# Постоянный профиль браузера с дисковым кэшем (пусто — обычный контекст из файла сессии)
+	browser_profile_dir: str = os.getenv("BROWSER_PROFILE_DIR", "")
+	browser_disk_cache_mb: int = _env_int("BROWSER_DISK_CACHE_MB", 100)
+	browser_ready_timeout_sec: int = _env_int("BROWSER_READY_TIMEOUT_SEC", 120)  # Сколько команды ждут запуска браузера
+	# Сколько максимум длится остановка клиента (циклы, отправки, сохранение, браузер)
+	shutdown_timeout_sec: float = _env_float("SHUTDOWN_TIMEOUT_SEC", 5.0)
 
 	auto_reply_enabled: bool = _env_bool("AUTO_REPLY_ENABLED", True)
 	auto_reply_text: str = os.getenv("AUTO_REPLY_TEXT") or "Здравствуйте! Опишите задачу, версию и бюджет."
@@ -46,8 +62,59 @@ class AppConfig:
 	dialog_reply_input_selector: str = os.getenv("DIALOG_REPLY_INPUT_SELECTOR", "textarea[name='content']")
 	dialog_reply_send_selector: str = os.getenv("DIALOG_REPLY_SEND_SELECTOR", ".chat-form-btn button[type='submit']")
 
-	# Селектор баланса
-	balance_selector: str = os.getenv("BALANCE_SELECTOR", "[data-balance], .balance, .header-balance")
+	# Баланс: бейдж в шапке FunPay есть на любой странице, в т.ч. на вкладке финансов
+	balance_selector: str = os.getenv("BALANCE_SELECTOR", ".badge-balance")
+	balance_monitor_enabled: bool = _env_bool("BALANCE_MONITOR_ENABLED", True)
+	balance_check_sec: int = _env_int("BALANCE_CHECK_SEC", 60)
+
+	# Периодическая проверка авторизации (cookie golden_key + лёгкий запрос)
+	auth_check_sec: int = _env_int("AUTH_CHECK_SEC", 120)
+
+	# Пересоздание долгоживущих вкладок (чаты, услуги); 0 — порог не проверяется
+	tab_health_check_sec: int = _env_int("TAB_HEALTH_CHECK_SEC", 300)
+	tab_max_heap_mb: int = _env_int("TAB_MAX_HEAP_MB", 300)
+	tab_max_dom_nodes: int = _env_int("TAB_MAX_DOM_NODES", 60000)
+	tab_max_age_hours: int = _env_int("TAB_MAX_AGE_HOURS", 24)
+
+	# Чтение страниц без рендера: request (context.request) или tab (fetch() во вкладке)
+	fetch_mode: str = os.getenv("FETCH_MODE", "request").strip().lower()
+	# Вкладки заказов, финансов и лотов — в отдельном контексте без JavaScript
+	scrape_context_enabled: bool = _env_bool("SCRAPE_CONTEXT_ENABLED", True)
+
+	# История рынка (снимки списков лотов)
+	market_db_path: str = os.getenv("MARKET_DB_PATH", "storage/market.db")
+	market_server: str = os.getenv("MARKET_SERVER", "FunTime")
+	price_sketches_path: str = os.getenv("PRICE_SKETCHES_PATH", "storage/price_sketches.json")
+	price_undercut_percent: float = _env_float("PRICE_UNDERCUT_PERCENT", 2.0)
+	lot_index_ttl_sec: int = _env_int("LOT_INDEX_TTL_SEC", 120)  # Сколько индекс лотов считается свежим
+
+	# Фоновый обход рынка (аккаунты 221, услуги 223, валюта 1596)
+	market_crawler_enabled: bool = _env_bool("MARKET_CRAWLER_ENABLED", True)
+	market_crawl_interval_sec: int = _env_int("MARKET_CRAWL_INTERVAL_SEC", 90)
+	market_snapshot_max_age_sec: int = _env_int("MARKET_SNAPSHOT_MAX_AGE_SEC", 600)
+	funpay_requests_per_min: int = _env_int("FUNPAY_REQUESTS_PER_MIN", 20)  # Общий бюджет загрузок страниц
+
+	# Уведомления о ценах
+	watch_rules_path: str = os.getenv("WATCH_RULES_PATH", "storage/watch_rules.json")
+
+	# Автоподстройка цен наших лотов: шаг ниже конкурента и минимальные цены по донатам
+	reprice_step: float = _env_float("REPRICE_STEP", 5.0)
+	reprice_floors: str = os.getenv("REPRICE_FLOORS", "")  # Например: князь:250,герцог:400
+	reprice_interval_sec: int = _env_int("REPRICE_INTERVAL_SEC", 300)
+	reprice_state_path: str = os.getenv("REPRICE_STATE_PATH", "storage/reprice_state.json")
+
+	# Отслеживание новых оплаченных заказов
+	order_watch_enabled: bool = _env_bool("ORDER_WATCH_ENABLED", True)
+	order_watch_interval_sec: int = _env_int("ORDER_WATCH_INTERVAL_SEC", 20)
+	seen_orders_path: str = os.getenv("SEEN_ORDERS_PATH", "storage/seen_orders.json")
+	# История продаж (orders/trade) в локальной базе
+	orders_db_path: str = os.getenv("ORDERS_DB_PATH", "storage/orders.db")
+	trade_sync_interval_sec: int = _env_int("TRADE_SYNC_INTERVAL_SEC", 300)
+	export_dir: str = os.getenv("EXPORT_DIR", "storage/exports")
+	export_cursor_path: str = os.getenv("EXPORT_CURSOR_PATH", "storage/export_cursor.json")
+	# Сообщение покупателю сразу после оплаты; подстановки: {buyer}, {order_id}, {description}
+	order_ack_enabled: bool = _env_bool("ORDER_ACK_ENABLED", True)
+	order_ack_text: str = os.getenv("ORDER_ACK_TEXT") or "Здравствуйте! Спасибо за оплату заказа {order_id}. Уже взял в работу, скоро напишу."
 
 	preset_replies_raw: str = os.getenv("PRESET_REPLIES", "Здравствуйте! Чем могу помочь?|Готов взяться, напишите детали.|Сделаю быстро и качественно.")
 
@@ -0,0 +1,100 @@
+import csv
+import json
+import os
+from typing import AsyncIterator, Optional, Tuple
+
+from .atomic_io import dump_json
+from .config import config
+from .parsers import parse_continue_token, parse_orders
+
+
+EXPORT_FIELDS = ("order_id", "date", "description", "buyer", "buyer_id", "status", "amount")
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+async def iter_trade_pages(request, start_token: Optional[str] = None, budget=None) -> AsyncIterator[Tuple[list, Optional[str]]]:
+	"""Страницы истории продаж orders/trade: (заказы страницы, токен следующей страницы).
+
+	request — APIRequestContext браузерного контекста (общие cookies сессии).
+	Страницы читаются по одной, поэтому память не растёт с размером истории.
+	Ошибка HTTP или редирект на страницу входа — RuntimeError, а не конец истории.
+	"""
+	url = config.funpay_base_url + "orders/trade"
+	token = start_token
+	first = start_token is None
+	while first or token:
+		if budget is not None:
+			await budget.acquire()
+		if first:
+			resp = await request.get(url)
+			first = False
+		else:
+			resp = await request.post(url, form={"continue": token}, headers={"X-Requested-With": "XMLHttpRequest"})
+		if not resp.ok:
+			raise RuntimeError(f"orders/trade ответил HTTP {resp.status}")
+		if "account/login" in resp.url:
+			raise RuntimeError("Сессия FunPay истекла (перенаправление на страницу входа)")
+		html = await resp.text()
+		orders = parse_orders(html)
+		token = parse_continue_token(html)
+		yield orders, token
+		if not orders:
+			return
+
+
+def _load_cursor(path: str) -> dict:
+	try:
+		if os.path.exists(path):
+			with open(path, "r", encoding="utf-8") as f:
+				return json.load(f)
+	except Exception as e:
+		print(f"[Export] Ошибка чтения курсора: {e}")
+	return {}
+
+
+def _save_cursor(path: str, cursor: dict) -> None:
+	dump_json(path, cursor, ensure_ascii=False)
+
+
+async def export_orders(request, target: str, fmt: str = "csv", cursor_path: Optional[str] = None, budget=None) -> dict:
+	"""Потоково выгружает всю историю продаж в CSV или JSONL.
+
+	После каждой страницы в cursor_path сохраняются токен следующей страницы и
+	размер уже записанного файла. Прерванная выгрузка в тот же файл продолжается
+	с места остановки (недописанный хвост обрезается).
+	Возвращает { 'path', 'rows', 'pages', 'resumed' }
+	"""
+	if fmt not in EXPORT_FORMATS:
+		raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+	cursor_path = cursor_path or config.export_cursor_path
+	cursor = _load_cursor(cursor_path)
+	resumed = bool(cursor) and cursor.get("target") == target and cursor.get("format") == fmt \
+		and os.path.exists(target) and bool(cursor.get("token"))
+	if resumed:
+		os.truncate(target, cursor["offset"])
+		print(f"[Export] Продолжаю выгрузку {target} со страницы {cursor['pages'] + 1}")
+	else:
+		cursor = {"target": target, "format": fmt, "token": None, "offset": 0, "pages": 0, "rows": 0}
+		os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+
+	with open(target, "a" if resumed else "w", encoding="utf-8", newline="") as f:
+		writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+		if writer and not resumed:
+			writer.writeheader()
+		async for orders, token in iter_trade_pages(request, cursor["token"], budget):
+			for order in orders:
+				if writer:
+					writer.writerow(order)
+				else:
+					f.write(json.dumps({k: order.get(k) for k in EXPORT_FIELDS}, ensure_ascii=False) + "\n")
+			f.flush()
+			cursor.update(token=token, offset=f.tell(), pages=cursor["pages"] + 1, rows=cursor["rows"] + len(orders))
+			_save_cursor(cursor_path, cursor)
+
+	# Выгрузка завершена — курсор больше не нужен
+	try:
+		os.remove(cursor_path)
+	except OSError:
+		pass
+	print(f"[Export] Выгружено {cursor['rows']} заказов ({cursor['pages']} стр.) в {target}")
+	return {"path": target, "rows": cursor["rows"], "pages": cursor["pages"], "resumed": resumed}
@@ -9,33 +9,135 @@ from typing import Optional
 
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 
+from .alerts import AlertWatcher
+from .atomic_io import dump_json
 from .config import config
+from .export import export_orders, iter_trade_pages
+from .market_store import MarketStore
+from .lot_index import LotIndex, detect_binding
+from .order_store import OrderStore
+from .parsers import (
+	clean_text, is_paid_status, parse_app_data, parse_chat_messages, parse_lot_listing, parse_orders, parse_own_offers,
+)
+from .price_sketch import PriceSketches
+from .repricer import Repricer
+from .scheduler import AuthMonitor, BalanceMonitor, MarketCrawler, OrderWatcher, RateBudget, TabHealthMonitor, TaskSupervisor
+from .session_cookies import import_session_cookies
 
 
 CREDENTIALS_PATH = Path("storage/credentials.json")
 
+# Профили блокировки ресурсов по назначению вкладки (шаблоны CDP Network.setBlockedURLs).
+# Исключений в setBlockedURLs нет, поэтому медиа и стили режем только на доменах FunPay
+# (funpay.com, sfunpay.com): reCAPTCHA (google.com/recaptcha, gstatic.com/recaptcha)
+# может всплыть на любой вкладке и не блокируется ни в одном профиле.
+_FUNPAY = "*funpay.com/*"
+_TRACKERS = ["*googletagmanager.com*", "*google-analytics.com*", "*mc.yandex.ru*", "*doubleclick.net*"]
+_THIRD_PARTY_SCRIPTS = ["*googlesyndication.com*", "*connect.facebook.net*", "*vk.com/js/*", "*top-fwz1.mail.ru*", "*yastatic.net*"]
+_MEDIA = [
+	_FUNPAY + ext + "*" for ext in (
+		".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico",
+		".woff", ".ttf", ".otf", ".eot", ".mp4", ".webm", ".mp3",
+	)
+]
+ROUTE_PROFILES = {
+	"login": [],  # Вход и капча — ничего не блокируем
+	"default": _MEDIA + _TRACKERS,
+	"chat": _MEDIA + _TRACKERS + _THIRD_PARTY_SCRIPTS,  # Скрипты и стили FunPay нужны чату и формам
+	"scrape": _MEDIA + _TRACKERS + _THIRD_PARTY_SCRIPTS + [_FUNPAY + ".css*"],
+}
+
 
 class FunPayClient:
+	# Постоянные вкладки: слот -> (атрибут, адрес, профиль блокировки)
+	_TAB_SLOTS = {
+		"main": ("_page", config.funpay_section_url, "default"),
+		"chat": ("_chat_page", "https://funpay.com/chat/", "chat"),
+		"services": ("_services_page", config.funpay_section_url, "chat"),
+	}
+	# Фоновые мониторы: имя задачи в TaskSupervisor
+	_MONITORS = ("crawler", "repricer", "order_watcher", "balance_monitor", "auth_monitor", "tab_health")
+
 	def __init__(self) -> None:
 		self._browser: Optional[Browser] = None
 		self._context: Optional[BrowserContext] = None
 		self._page: Optional[Page] = None
 		self._orders_page: Optional[Page] = None
 		self._running: bool = False
+		self.tasks = TaskSupervisor()  # Фоновые задачи клиента: перезапуск при падении, отмена в stop()
+		self._stop_event = asyncio.Event()  # Прерывает ожидания циклов при остановке
+		self._outbox: set = set()  # Отправки в Telegram, которые дожидаемся при выходе
+		# Готовность браузера: Telegram запускается раньше и ждёт этого события
+		self._ready = asyncio.Event()
+		self._launch_lock = asyncio.Lock()
+		self._pw = None
+		self._attached = False  # Подключены к браузеру демона по CDP
+		self.launch_error: Optional[str] = None
+		self._chat_page: Optional[Page] = None
+		self._services_page: Optional[Page] = None
 		self._post_text: str = config.post_text
 		self._post_interval_sec: int = max(60, config.post_interval_minutes * 60)
 		self._last_unread_count: int = 0  # Для отслеживания новых сообщений
 		self._screenshot_callback = None  # Коллбэк для отправки скриншотов в TG
+		self._alert_callback = None  # Коллбэк для отправки уведомлений о ценах в TG
 		# Кэши для ускорения ответов в Telegram
 		self._cached_balance: Optional[str] = None
 		self._cached_balance_ts: float = 0.0
-		self._cached_trade_totals: Optional[dict] = None
-		self._cached_trade_totals_ts: float = 0.0
 		self._cached_active_orders: Optional[list] = None
 		self._cached_active_orders_ts: float = 0.0
 		# Убрано отслеживание обработанных услуг - бот должен писать постоянно
 		self._processed_dialogs: dict = {}  # Отслеживаем обработанные диалоги навсегда
 		self._processed_dialogs_file = "storage/processed_dialogs.json"
+		# История рынка: снимки списков лотов
+		self._market = MarketStore(config.market_db_path)
+		# Потоковые квантильные скетчи цен по донатам/серверам
+		self.price_sketches = PriceSketches(config.price_sketches_path)
+		# Индекс лотов аккаунтов по (донат, привязка) из последнего обхода
+		self._account_index = LotIndex()
+		self._account_index_lock = asyncio.Lock()  # Одновременные запросы делят одно обновление индекса
+		# Последние распарсенные списки лотов по категориям: { категория: { 'ts', 'lots' } }
+		self._snapshots: dict = {}
+		# Общий бюджет загрузок страниц и фоновый обход рынка
+		self.rate_budget = RateBudget(config.funpay_requests_per_min)
+		self.crawler = MarketCrawler(self, config.market_crawl_interval_sec)
+		# Правила наблюдения за ценами
+		self.alerts = AlertWatcher(config.watch_rules_path)
+		# Автоподстройка цен наших лотов
+		self.repricer = Repricer(self)
+		self._reprice_page: Optional[Page] = None
+		# Отслеживание новых оплаченных заказов
+		self.order_watcher = OrderWatcher(self, config.order_watch_interval_sec, config.seen_orders_path)
+		self.order_watcher.add_listener(self._on_new_order)
+		self._send_page: Optional[Page] = None  # Вкладка для срочных сообщений покупателям
+		# Локальная история продаж с инкрементальными итогами
+		self._orders = OrderStore(config.orders_db_path)
+		self._trade_sync_ts: float = 0.0
+		self._trade_sync_task: Optional[asyncio.Task] = None
+		# Баланс со вкладки финансов
+		self._finance_page: Optional[Page] = None
+		self.balance_monitor = BalanceMonitor(self, config.balance_check_sec)
+		# Состояние авторизации: None — ещё не проверяли; циклы ждут _auth_ok
+		self.logged_in: Optional[bool] = None
+		self._auth_ok = asyncio.Event()
+		self._auth_ok.set()
+		self.auth_monitor = AuthMonitor(self, config.auth_check_sec)
+		self._app_data: dict = {}  # data-app-data страницы: userId, csrf-token
+		self._cdp_sessions: dict = {}  # Вкладка -> CDP-сессия с её профилем блокировки
+		# Лёгкий контекст без JavaScript для страниц, которые только читаем
+		self._scrape_context: Optional[BrowserContext] = None
+		self._scrape_cookies_ts: float = 0.0
+		# Долгоживущие вкладки: время создания и ожидающие пересоздания
+		self._tab_born: dict = {}
+		self._recycle_pending: set = set()
+		# Вкладку держит тот, кто с ней работает; пересоздание ждёт, пока её отпустят
+		self._tab_locks = {slot: asyncio.Lock() for slot in self._TAB_SLOTS}
+		# Сторож падений: браузер, закрытый нами намеренно, и идущее восстановление
+		self._dropped = None
+		self._recovering = False
+		self.tab_health = TabHealthMonitor(
+			self, config.tab_health_check_sec,
+			config.tab_max_heap_mb, config.tab_max_dom_nodes, config.tab_max_age_hours,
+		)
 
 	@property
 	def running(self) -> bool:
@@ -51,9 +153,60 @@ class FunPayClient:
 		"""Устанавливает коллбэк для отправки скриншотов в Telegram"""
 		self._screenshot_callback = callback
 
+	def set_alert_callback(self, callback) -> None:
+		"""Устанавливает коллбэк для уведомлений о сработавших правилах цен"""
+		self._alert_callback = callback
+
+	@property
+	def ready(self) -> bool:
+		return self._ready.is_set()
+
+	@property
+	def starting(self) -> bool:
+		return not self._ready.is_set() and self.launch_error is None
+
+	async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+		"""Ждёт запуска браузера; False — не успел или запуск завершился ошибкой"""
+		if self._ready.is_set():
+			return True
+		if self.launch_error is not None:
+			return False
+		try:
+			await asyncio.wait_for(self._ready.wait(), timeout)
+			return True
+		except asyncio.TimeoutError:
+			return False
+
+	async def launch_in_background(self) -> None:
+		"""Запуск браузера, не блокирующий старт Telegram-бота"""
+		try:
+			await self.launch()
+		except Exception as e:
+			self.launch_error = str(e) or e.__class__.__name__
+			print(f"[FunPay] Ошибка запуска браузера: {e}")
+
+	def retry_launch(self) -> bool:
+		"""Повторный фоновый запуск после неудачного; False — повторять нечего или запуск уже идёт"""
+		if self._ready.is_set() or self.launch_error is None or self._launch_lock.locked():
+			return False
+		self.launch_error = None
+		self._spawn(self.launch_in_background())
+		return True
+
 	async def launch(self, force_headful: bool = False) -> None:
+		async with self._launch_lock:
+			# Параллельный вызов во время запуска — браузер уже поднят
+			if self._context and self._page and not self._page.is_closed():
+				return
+			self.launch_error = None
+			await self._launch(force_headful)
+			self._ready.set()
+
+	async def _launch(self, force_headful: bool = False) -> None:
+		started = time.monotonic()
 		Path(os.path.dirname(config.storage_path) or ".").mkdir(parents=True, exist_ok=True)
-		pw = await async_playwright().start()
+		pw = self._pw or await async_playwright().start()
+		self._pw = pw
 		
 		# Проверяем, есть ли сохранённая сессия
 		storage_state = None
@@ -69,10 +222,18 @@ class FunPayClient:
 		# Если сессия есть - работаем в headless режиме, если не принудительно headful
 		headless_mode = (config.headless if has_session else False) and not force_headful
 		
-		# Запускаем браузер с параметрами, чтобы обойти детекцию ботов
-		self._browser = await pw.chromium.launch(
-			headless=headless_mode,
-			args=[
+		if config.browser_cdp_url and not force_headful:
+			# Браузером владеет отдельный демон (scripts/browser_daemon.py) — подключаемся к нему,
+			# его кэш и открытые вкладки переживают перезапуск бота
+			self._browser = await pw.chromium.connect_over_cdp(config.browser_cdp_url)
+			self._context = self._browser.contexts[0] if self._browser.contexts else await self._browser.new_context()
+			self._attached = True
+			await self._context.set_extra_http_headers({'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7'})
+			await self._import_session_cookies()
+			print(f"[FunPay] Подключён к браузеру {config.browser_cdp_url} (вкладок: {len(self._context.pages)})")
+		else:
+			self._attached = False
+			browser_args = [
 				'--disable-blink-features=AutomationControlled',
 				'--disable-dev-shm-usage',
 				'--no-sandbox',
@@ -80,88 +241,314 @@ class FunPayClient:
 				'--disable-web-security',
 				'--disable-features=IsolateOrigins,site-per-process'
 			]
-		)
-		
-		# Контекст с "человеческими" параметрами
-		self._context = await self._browser.new_context(
-			storage_state=storage_state,
-			viewport={'width': 1920, 'height': 1080},
-			user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-			locale='ru-RU',
-			timezone_id='Europe/Moscow',
-			permissions=['geolocation'],
-			extra_http_headers={
-				'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-				'Accept-Encoding': 'gzip, deflate, br',
-				'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8'
-			}
-		)
+			# Контекст с "человеческими" параметрами
+			context_options = dict(
+				viewport={'width': 1920, 'height': 1080},
+				user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+				locale='ru-RU',
+				timezone_id='Europe/Moscow',
+				permissions=['geolocation'],
+				extra_http_headers={
+					'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+					'Accept-Encoding': 'gzip, deflate, br',
+					'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8'
+				}
+			)
+			if config.browser_profile_dir:
+				# Постоянный профиль: HTTP-кэш на диске переживает перезапуски,
+				# файл сессии по-прежнему импортируется и сохраняется при выходе
+				Path(config.browser_profile_dir).mkdir(parents=True, exist_ok=True)
+				self._context = await pw.chromium.launch_persistent_context(
+					config.browser_profile_dir,
+					headless=headless_mode,
+					args=browser_args + [
+						f"--disk-cache-dir={os.path.join(config.browser_profile_dir, 'cache')}",
+						f"--disk-cache-size={config.browser_disk_cache_mb * 1024 * 1024}",
+					],
+					**context_options,
+				)
+				self._browser = None
+				await self._import_session_cookies()
+				print(f"[FunPay] Постоянный профиль {config.browser_profile_dir} (кэш до {config.browser_disk_cache_mb} МБ)")
+			else:
+				# Запускаем браузер с параметрами, чтобы обойти детекцию ботов
+				self._browser = await pw.chromium.launch(headless=headless_mode, args=browser_args)
+				self._context = await self._browser.new_context(storage_state=storage_state, **context_options)
 
-		# Блокируем тяжёлые ресурсы для ускорения загрузки страниц, но НЕ блокируем reCAPTCHA
-		async def _route_filter(route):
-			try:
-				req = route.request
-				url = req.url.lower()
-				rt = req.resource_type
-				# НЕ блокируем reCAPTCHA и связанные с ней ресурсы
-				if any(h in url for h in ["recaptcha", "google.com/recaptcha", "gstatic.com/recaptcha"]):
-					return await route.continue_()
-				# Блокируем остальные тяжёлые ресурсы
-				if rt in ["image", "font", "media"] or any(h in url for h in [
-					"googletagmanager", "google-analytics", "mc.yandex", "doubleclick"
-				]):
-					return await route.abort()
-				return await route.continue_()
-			except Exception:
-				try:
-					await route.continue_()
-				except Exception:
-					pass
-		await self._context.route("**/*", _route_filter)
+		# Блокировка ресурсов задаётся для каждой вкладки отдельно (ROUTE_PROFILES)
+		self._cdp_sessions = {}
+		self._scrape_context = None
 		
-		self._page = await self._context.new_page()
-		
-		# Убираем признаки автоматизации
-		await self._page.add_init_script("""
+		# Убираем признаки автоматизации (во всех вкладках контекста)
+		await self._context.add_init_script("""
 			Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
 			window.navigator.chrome = {runtime: {}};
 			Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
 			Object.defineProperty(navigator, 'languages', {get: () => ['ru-RU', 'ru', 'en-US', 'en']});
 		""")
-		
-		await self._page.goto(config.funpay_section_url, wait_until="domcontentloaded")
-
-		# Создаём несколько вкладок для разных задач
+		# При подключении к демону берём уже открытые вкладки вместо новых
+		existing = [p for p in self._context.pages if not p.is_closed()] if self._attached else []
+		chat_tab = self._take_tab(existing, "https://funpay.com/chat")
+		services_tab = self._take_tab(existing, config.funpay_section_url)
+		self._page = self._take_tab(existing, config.funpay_base_url)
+		main_ready = self._page is not None
+		if not self._page:
+			self._page = await self._context.new_page()
+		await asyncio.gather(*(
+			self._set_route_profile(tab, profile)
+			for tab, profile in ((self._page, "default"), (chat_tab, "chat"), (services_tab, "chat"))
+			if tab
+		))
+
+		# Основная вкладка, чаты и услуги открываются параллельно;
+		# вкладки заказов и финансов создаются при первом использовании
 		self._orders_page = None
-		self._chat_page = None
-		self._services_page = None
 		self._finance_page = None
-		
+		main_result, chat_page, services_page = await asyncio.gather(
+			self._noop() if main_ready else self._page.goto(config.funpay_section_url, wait_until="domcontentloaded"),
+			self._noop(chat_tab) if chat_tab else self._open_tab("https://funpay.com/chat/", "chat"),
+			self._noop(services_tab) if services_tab else self._open_tab(config.funpay_section_url, "chat"),
+			return_exceptions=True,
+		)
+		if isinstance(main_result, Exception):
+			raise main_result
+		self._chat_page = chat_page if isinstance(chat_page, Page) else None
+		self._services_page = services_page if isinstance(services_page, Page) else None
+		self._recycle_pending.clear()
+		for tab in (self._chat_page, self._services_page):
+			if tab:
+				self._tab_born[tab] = time.monotonic()
+		for name, result in (("чатов", chat_page), ("услуг", services_page)):
+			if isinstance(result, Exception):
+				print(f"[FunPay] Ошибка создания вкладки {name}: {result}")
+
+		# Падение вкладки или всего браузера восстанавливается без участия администратора
+		self._watch_crashes(self._context)
+		owner = self._browser or self._context
+		if self._browser:
+			self._browser.on("disconnected", lambda _: self._on_browser_lost(owner))
+		else:
+			self._context.on("close", lambda _: self._on_browser_lost(owner))
+
+		# Фоновые задачи; активные заказы и баланс обновляют свои мониторы
+		self.tasks.start("auth_monitor", self.auth_monitor.run)
+		self.tasks.start("tab_health", self.tab_health.run)
+		if config.balance_monitor_enabled:
+			self.tasks.start("balance_monitor", self.balance_monitor.run)
+		else:
+			self._spawn(self.fetch_balance())
+		self._schedule_trade_sync()
+		if config.market_crawler_enabled:
+			self.tasks.start("crawler", self.crawler.run)
+		if config.order_watch_enabled:
+			self.tasks.start("order_watcher", self.order_watcher.run)
+		else:
+			self._spawn(self.fetch_active_orders())
+		print(f"[FunPay] Браузер готов за {time.monotonic() - started:.1f} сек")
+
+	@staticmethod
+	def _take_tab(pages: list, url_prefix: str) -> Optional[Page]:
+		for page in pages:
+			if page.url.startswith(url_prefix):
+				pages.remove(page)
+				return page
+		return None
+
+	@staticmethod
+	async def _noop(value=None):
+		return value
+
+	async def _import_session_cookies(self) -> None:
+		"""Переносит cookies из сохранённой сессии в контекст демона/профиля, если в нём нет входа"""
 		try:
-			# Вкладка для заказов
-			self._orders_page = await self._context.new_page()
-			await self._orders_page.goto(config.funpay_base_url + "orders/trade?state=paid", wait_until="domcontentloaded")
-			
-			# Вкладка для чатов
-			self._chat_page = await self._context.new_page()
-			await self._chat_page.goto("https://funpay.com/chat/", wait_until="domcontentloaded")
-			
-			# Вкладка для услуг (автопост)
-			self._services_page = await self._context.new_page()
-			await self._services_page.goto(config.funpay_section_url, wait_until="domcontentloaded")
-			
-			# Вкладка для финансов
-			self._finance_page = await self._context.new_page()
-			await self._finance_page.goto(config.funpay_base_url + "account/finance", wait_until="domcontentloaded")
-			
-			print("[FunPay] Открыто 4 вкладки для быстрой работы")
+			if await import_session_cookies(self._context, config.storage_path, config.funpay_base_url):
+				print("[FunPay] Cookies сессии перенесены в браузер демона")
 		except Exception as e:
-			print(f"[FunPay] Ошибка создания вкладок: {e}")
+			print(f"[FunPay] Ошибка переноса cookies: {e}")
+
+	async def _new_tab(self, profile: str, context: Optional[BrowserContext] = None) -> Page:
+		page = await (context or self._context).new_page()
+		await self._set_route_profile(page, profile)
+		return page
 
-		# Предзагрузка кешей, чтобы первые ответы были быстрыми
-		asyncio.create_task(self.fetch_balance())
-		asyncio.create_task(self.fetch_trade_totals())
-		asyncio.create_task(self.fetch_active_orders())
+	async def _ensure_scrape_context(self) -> BrowserContext:
+		"""Контекст для чтения серверных страниц: без JavaScript, маленькое окно,
+		cookies сессии копируются из основного контекста"""
+		if not self._context:
+			await self.launch()
+		if not config.scrape_context_enabled or not self._browser:
+			# Постоянный профиль не даёт создать второй контекст — читаем в основном
+			return self._context
+		if self._scrape_context is None:
+			self._scrape_context = await self._browser.new_context(
+				java_script_enabled=False,
+				viewport={'width': 800, 'height': 600},
+				user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+				locale='ru-RU',
+				timezone_id='Europe/Moscow',
+			)
+			self._watch_crashes(self._scrape_context)
+			self._scrape_cookies_ts = 0.0
+		# Cookies сессии могут обновиться (перелогин, новый PHPSESSID) — раз в минуту синхронизируем
+		if time.time() - self._scrape_cookies_ts > 60:
+			await self._scrape_context.add_cookies(await self._context.cookies())
+			self._scrape_cookies_ts = time.time()
+		return self._scrape_context
+
+	async def _ensure_scrape_page(self) -> Page:
+		"""Вкладка только для чтения (заказы, страницы лотов)"""
+		context = await self._ensure_scrape_context()
+		if not self._orders_page or self._orders_page.is_closed():
+			self._orders_page = await self._new_tab("scrape", context)
+		return self._orders_page
+
+	async def _open_tab(self, url: str, profile: str) -> Page:
+		page = await self._new_tab(profile)
+		await page.goto(url, wait_until="domcontentloaded")
+		return page
+
+	async def _set_route_profile(self, page: Page, profile: str) -> None:
+		"""Блокирует ресурсы вкладки средствами самого Chromium (Network.setBlockedURLs),
+		поэтому Python не вызывается на каждый запрос"""
+		try:
+			session = await self._cdp_session(page)
+			await session.send("Network.setBlockedURLs", {"urls": ROUTE_PROFILES[profile]})
+		except Exception as e:
+			print(f"[FunPay] Не удалось задать профиль блокировки {profile}: {e}")
+
+	async def _cdp_session(self, page: Page):
+		session = self._cdp_sessions.get(page)
+		if session is None:
+			session = await page.context.new_cdp_session(page)
+			await session.send("Network.enable")
+			self._cdp_sessions[page] = session
+			page.once("close", self._forget_tab)
+		return session
+
+	def _forget_tab(self, page: Page) -> None:
+		self._cdp_sessions.pop(page, None)
+		self._tab_born.pop(page, None)
+
+	def long_lived_tabs(self) -> dict:
+		"""Вкладки, открытые всё время работы: { слот: вкладка }"""
+		tabs = {"chat": self._chat_page, "services": self._services_page}
+		return {slot: page for slot, page in tabs.items() if page and not page.is_closed()}
+
+	def tab_age(self, page: Page) -> float:
+		born = self._tab_born.get(page)
+		return time.monotonic() - born if born is not None else 0.0
+
+	async def page_metrics(self, page: Page) -> dict:
+		"""Метрики вкладки из CDP Performance.getMetrics: { 'JSHeapUsedSize', 'Nodes', ... }"""
+		session = await self._cdp_session(page)
+		await session.send("Performance.enable")
+		result = await session.send("Performance.getMetrics")
+		return {m["name"]: m["value"] for m in result.get("metrics", [])}
+
+	def request_tab_recycle(self, slot: str) -> None:
+		"""Помечает вкладку к пересозданию; циклы делают это между итерациями"""
+		self._recycle_pending.add(slot)
+		if not self._running:
+			# Циклов нет, но вкладкой могут пользоваться команды: пересоздание дождётся её блокировки
+			self._spawn(self.recycle_pending_tabs())
+
+	async def recycle_pending_tabs(self) -> None:
+		"""Пересоздаёт помеченные вкладки (вызывается в безопасной точке цикла)"""
+		for slot in list(self._recycle_pending):
+			self._recycle_pending.discard(slot)
+			await self._recycle_tab(slot)
+
+	async def _recycle_tab(self, slot: str) -> bool:
+		attr, url, profile = self._TAB_SLOTS[slot]
+		async with self._tab_locks[slot]:
+			old = getattr(self, attr)
+			try:
+				page = await self._open_tab(url, profile)
+			except Exception as e:
+				print(f"[FunPay] Не удалось пересоздать вкладку {slot}: {e}")
+				return False
+			setattr(self, attr, page)
+			self._tab_born[page] = time.monotonic()
+			if old and not old.is_closed():
+				try:
+					await old.close()
+				except Exception:
+					pass
+		print(f"[FunPay] Вкладка {slot} пересоздана")
+		return True
+
+	def _watch_crashes(self, context: BrowserContext) -> None:
+		"""Подписывает все вкладки контекста (и будущие) на событие падения"""
+		for page in context.pages:
+			page.on("crash", self._on_tab_crash)
+		context.on("page", lambda page: page.on("crash", self._on_tab_crash))
+
+	def _on_tab_crash(self, page: Page) -> None:
+		slot = next((slot for slot, (attr, _, _) in self._TAB_SLOTS.items() if getattr(self, attr) is page), None)
+		print(f"[FunPay] ⚠️ Вкладка {slot or page.url} упала")
+		self._spawn(self._recover_tab(page, slot))
+
+	async def _recover_tab(self, page: Page, slot: Optional[str]) -> None:
+		started = time.monotonic()
+		if slot in ("chat", "services") and self._running:
+			# Циклы сами подхватят новую вкладку на следующей итерации
+			self._recycle_pending.add(slot)
+			return
+		if slot:
+			ok = await self._recycle_tab(slot)
+			if ok:
+				await self.notify(f"♻️ Вкладка {slot} упала и пересоздана за {time.monotonic() - started:.1f} сек")
+			return
+		# Вспомогательные вкладки (заказы, финансы, отправка) создаются заново при следующем использовании
+		try:
+			await page.close()
+		except Exception:
+			pass
+
+	def _on_browser_lost(self, owner) -> None:
+		if owner is self._dropped or owner not in (self._browser, self._context) or self._recovering:
+			return
+		print("[FunPay] ⚠️ Браузер отключился — перезапускаю из сохранённой сессии")
+		self._recovering = True
+		self._spawn(self._recover_browser())
+
+	async def _recover_browser(self) -> None:
+		started = time.monotonic()
+		self._ready.clear()  # Фоновые циклы ждут в wait_logged_in
+		self._forget_browser()
+		delay = 2
+		try:
+			while True:
+				try:
+					await self.launch()
+					break
+				except Exception as e:
+					print(f"[FunPay] Перезапуск браузера не удался: {e}; повтор через {delay} сек")
+					# Недозапущенный браузер закрываем и забываем: иначе launch() увидит
+					# его вкладку и не станет запускаться заново, а сам он останется висеть
+					try:
+						await self._close_browser()
+					except Exception:
+						pass
+					self._forget_browser()
+					await asyncio.sleep(delay)
+					delay = min(delay * 2, 60)
+		finally:
+			self._recovering = False
+		downtime = time.monotonic() - started
+		print(f"[FunPay] Браузер восстановлен, простой {downtime:.1f} сек")
+		await self.notify(f"♻️ Браузер упал и перезапущен из сохранённой сессии, простой {downtime:.1f} сек")
+
+	def _forget_browser(self) -> None:
+		self._browser = None
+		self._context = None
+		self._scrape_context = None
+		self._page = self._chat_page = self._services_page = None
+		self._orders_page = self._finance_page = self._send_page = self._reprice_page = None
+
+	def _spawn(self, coro) -> asyncio.Task:
+		"""Разовая фоновая задача под присмотром супервизора (ссылка хранится, ошибка печатается)"""
+		return self.tasks.spawn(coro)
 
 	async def open_login_browser(self) -> bool:
 		"""Открыть браузер с окном логина FunPay (принудительно headful)."""
@@ -169,11 +556,10 @@ class FunPayClient:
 			# Остановим все процессы
 			await self.stop()
 			# Перезапустим браузер в headful-режиме, чтобы показать окно
-			if self._browser:
-				try:
-					await self._browser.close()
-				except Exception:
-					pass
+			try:
+				await self._close_browser()
+			except Exception:
+				pass
 			self._browser = None
 			self._context = None
 			self._page = None
@@ -181,43 +567,161 @@ class FunPayClient:
 			await self.launch(force_headful=True)
 			if not self._page:
 				return False
+			await self._set_route_profile(self._page, "login")
 			print("[FunPay] Открываю страницу логина для ручного ввода")
 			await self._page.goto(config.funpay_base_url + "account/login", wait_until="domcontentloaded")
 			print("[FunPay] Введите логин и пароль в открывшемся окне, решите капчу и нажмите Войти")
+			self._spawn(self._watch_manual_login())
 			return True
 		except Exception as e:
 			print(f"[FunPay] Ошибка открытия окна логина: {e}")
 			return False
 
+	async def _watch_manual_login(self) -> None:
+		"""Сохраняет сессию, как только вход в окне браузера завершён"""
+		logged_in = await self._wait_for_login(600)
+		if self._page and not self._page.is_closed():
+			await self._set_route_profile(self._page, "default")
+		if logged_in:
+			await self.notify("✅ Вход в FunPay выполнен, сессия сохранена")
+
 	async def _ensure_orders_page(self) -> Page:
-		if not self._orders_page or self._orders_page.is_closed():
-			if not self._context:
-				await self.launch()
-			self._orders_page = await self._context.new_page()
-		await self._orders_page.goto(config.funpay_base_url + "orders/trade?state=paid", wait_until="domcontentloaded")
-		return self._orders_page
+		page = await self._ensure_scrape_page()
+		await page.goto(config.funpay_base_url + "orders/trade?state=paid", wait_until="domcontentloaded")
+		return page
 
 	async def close(self) -> None:
+		"""Остановка с дедлайном SHUTDOWN_TIMEOUT_SEC: циклы выходят в безопасной точке,
+		исходящие отправки дожидаются, состояние сохраняется атомарно, затем закрывается браузер"""
+		started = time.monotonic()
+		deadline = started + config.shutdown_timeout_sec
+
+		def left(share: float = 1.0) -> float:
+			return max(0.1, (deadline - time.monotonic()) * share)
+
 		self._running = False
+		self._stop_event.set()
+		await asyncio.gather(
+			self.tasks.stop("services", timeout=left(0.2), grace=left(0.3)),
+			*(self.tasks.stop(name, timeout=left(0.2)) for name in self._MONITORS),
+			return_exceptions=True,
+		)
+		# Недоставленные уведомления и скриншоты
+		if self._outbox:
+			done, pending = await asyncio.wait(set(self._outbox), timeout=left(0.5))
+			if pending:
+				print(f"[FunPay] Не успели отправить в Telegram: {len(pending)}")
+		await self.tasks.stop(timeout=left(0.2))
+		self.flush_state()
 		if self._context:
-			await self._context.storage_state(path=config.storage_path)
-			print(f"[FunPay] Сессия сохранена в {config.storage_path}")
-		if self._browser:
-			await self._browser.close()
+			try:
+				await asyncio.wait_for(self._save_storage_state(), left(0.5))
+				print(f"[FunPay] Сессия сохранена в {config.storage_path}")
+			except Exception as e:
+				print(f"[FunPay] Ошибка сохранения сессии: {e}")
+		try:
+			await asyncio.wait_for(self._close_browser(), left())
+		except Exception as e:
+			print(f"[FunPay] Браузер не закрылся вовремя: {e}")
+		if self._pw:
+			# Для браузера демона — только отключение, сам браузер и вкладки остаются
+			try:
+				await asyncio.wait_for(self._pw.stop(), left())
+			except Exception:
+				pass
+			self._pw = None
 		self._browser = None
 		self._context = None
 		self._page = None
+		self._market.close()
+		self._orders.close()
+		print(f"[FunPay] Остановлен за {time.monotonic() - started:.2f} сек")
+
+	def flush_state(self) -> None:
+		"""Сохраняет всё состояние на диск (каждый файл записывается атомарно)"""
+		self._save_processed_dialogs()
+		self.order_watcher.save()
+		self.repricer.save()
+		self.alerts.save()
+		self.price_sketches.save()
+
+	async def _save_storage_state(self) -> None:
+		"""storage_state во временный файл и замена — обрыв не испортит файл сессии"""
+		tmp = config.storage_path + ".tmp"
+		await self._context.storage_state(path=tmp)
+		os.replace(tmp, config.storage_path)
+
+	def _outbound(self, coro):
+		"""Отправка в Telegram, которая переживает отмену цикла; при выходе её дожидаемся"""
+		task = asyncio.create_task(coro)
+		self._outbox.add(task)
+		task.add_done_callback(self._outbox.discard)
+		return asyncio.shield(task)
+
+	async def _pause(self, seconds: float) -> None:
+		"""Ожидание внутри цикла, которое прерывается остановкой клиента"""
+		try:
+			await asyncio.wait_for(self._stop_event.wait(), seconds)
+		except asyncio.TimeoutError:
+			pass
+
+	async def _close_browser(self) -> None:
+		"""Закрывает свой браузер; от браузера демона только отключаемся"""
+		self._dropped = self._browser or self._context  # Намеренное закрытие — не падение
+		if self._scrape_context:
+			# Свой контекст закрываем и в браузере демона, иначе он там останется
+			try:
+				await self._scrape_context.close()
+			except Exception:
+				pass
+			self._scrape_context = None
+		if self._attached:
+			return
+		if self._browser:
+			await self._browser.close()
+		elif self._context:
+			# Постоянный профиль: браузер принадлежит контексту
+			await self._context.close()
+
+	async def probe_auth(self) -> bool:
+		"""Дешёвая проверка авторизации: cookie golden_key и запрос без перехода по редиректу.
+
+		Неавторизованного пользователя account/settings перенаправляет на account/login.
+		"""
+		if not self._context:
+			return False
+		cookies = await self._context.cookies(config.funpay_base_url)
+		if not any(c["name"] == "golden_key" and c["value"] for c in cookies):
+			return False
+		resp = await self._context.request.get(config.funpay_base_url + "account/settings", max_redirects=0)
+		return resp.status == 200
+
+	def set_auth_state(self, logged_in: bool) -> None:
+		self.logged_in = logged_in
+		if logged_in:
+			self._auth_ok.set()
+		else:
+			self._auth_ok.clear()
+
+	async def wait_logged_in(self) -> None:
+		"""Пауза для фоновых циклов, пока браузер и сессия FunPay не восстановлены"""
+		if not self._ready.is_set():
+			await self._ready.wait()
+		if not self._auth_ok.is_set():
+			await self._auth_ok.wait()
 
 	async def reset_session(self) -> bool:
 		"""Полный сброс сессии: закрыть браузер, удалить storage и кеши."""
 		try:
 			# Остановим процессы и закроем браузер
 			await self.stop()
-			if self._browser:
-				try:
-					await self._browser.close()
-				except Exception:
-					pass
+			try:
+				# Постоянный профиль и браузер демона хранят cookies сами — чистим их тоже
+				if self._context:
+					await self._context.clear_cookies()
+				await self._close_browser()
+			except Exception:
+				pass
 			self._browser = None
 			self._context = None
 			self._page = None
@@ -237,10 +741,8 @@ class FunPayClient:
 				pass
 			# Сброс кешей
 			self._cached_balance = None
-			self._cached_trade_totals = None
 			self._cached_active_orders = None
 			self._cached_balance_ts = 0.0
-			self._cached_trade_totals_ts = 0.0
 			self._cached_active_orders_ts = 0.0
 			print("[FunPay] Сессия и учётные данные сброшены")
 			return True
@@ -248,11 +750,63 @@ class FunPayClient:
 			print(f"[FunPay] Ошибка сброса сессии: {e}")
 			return False
 
+	async def _wait_for_login(self, timeout: float) -> bool:
+		"""Ждёт завершения входа по событиям: Set-Cookie с golden_key или уход со страницы account/login.
+
+		Сессия сохраняется сразу после подтверждения входа.
+		"""
+		page = self._page
+		if not page or not self._context:
+			return False
+		done = asyncio.get_running_loop().create_future()
+
+		def _finish(reason: str) -> None:
+			if not done.done():
+				done.set_result(reason)
+
+		def _on_navigated(frame) -> None:
+			if frame == page.main_frame and "account/login" not in frame.url:
+				_finish("navigation")
+
+		async def _on_response(response) -> None:
+			if done.done() or "funpay.com" not in response.url:
+				return
+			try:
+				cookie = await response.header_value("set-cookie")
+			except Exception:
+				return
+			if cookie and "golden_key=" in cookie:
+				_finish("cookie")
+
+		page.on("framenavigated", _on_navigated)
+		self._context.on("response", _on_response)
+		started = time.monotonic()
+		try:
+			# Подтверждаем событие лёгкой проверкой: редирект мог быть и на ошибку входа
+			while True:
+				remaining = timeout - (time.monotonic() - started)
+				if remaining <= 0:
+					return False
+				try:
+					reason = await asyncio.wait_for(asyncio.shield(done), timeout=remaining)
+				except asyncio.TimeoutError:
+					return False
+				if await self.probe_auth():
+					print(f"[FunPay] ✅ Вход успешен ({reason}, {time.monotonic() - started:.1f} сек)")
+					self.set_auth_state(True)
+					await self._save_storage_state()
+					return True
+				done = asyncio.get_running_loop().create_future()
+		finally:
+			page.remove_listener("framenavigated", _on_navigated)
+			self._context.remove_listener("response", _on_response)
+
 	async def login_with_credentials(self, login: str, password: str) -> bool:
 		"""Вход по логину (username) и паролю - РУЧНОЙ режим с ожиданием"""
 		if not self._page:
 			return False
 		try:
+			await self._set_route_profile(self._page, "login")
 			print(f"[FunPay] Открываю страницу входа для логина: {login}")
 			await self._page.goto(config.funpay_base_url + "account/login", wait_until="domcontentloaded")
 			await self._page.wait_for_timeout(2000)
@@ -277,38 +831,26 @@ class FunPayClient:
 			print("[FunPay] Ожидаю 5 минут (300 секунд) на решение капчи и вход...")
 			
 			# Ждём 5 минут (300 секунд), чтобы пользователь решил капчу и нажал кнопку
-			for i in range(60):  # 60 * 5 = 300 секунд = 5 минут
-				await self._page.wait_for_timeout(5000)
-				html = await self._page.content()
-				if "account/logout" in html or "Выйти" in html or "badge-balance" in html:
-					print("[FunPay] ✅ Вход успешен!")
-					await self._context.storage_state(path=config.storage_path)
-					try:
-						CREDENTIALS_PATH.parent.mkdir(parents=True, exist_ok=True)
-						CREDENTIALS_PATH.write_text(json.dumps({"login": login, "password": password}), encoding="utf-8")
-					except Exception:
-						pass
-					return True
-				print(f"[FunPay] Проверка {i+1}/60... (осталось ~{300-(i+1)*5} сек)")
-			
-			print("[FunPay] ⏰ Время вышло. Проверяю финальный статус...")
-			html = await self._page.content()
-			if "account/logout" in html or "Выйти" in html:
-				print("[FunPay] ✅ Вход успешен (финальная проверка)!")
-				await self._context.storage_state(path=config.storage_path)
+			if await self._wait_for_login(300):
+				try:
+					CREDENTIALS_PATH.parent.mkdir(parents=True, exist_ok=True)
+					CREDENTIALS_PATH.write_text(json.dumps({"login": login, "password": password}), encoding="utf-8")
+				except Exception:
+					pass
 				return True
-			else:
-				print("[FunPay] ❌ Вход не удался — возможно, капча не решена или неверные данные")
-				return False
+			print("[FunPay] ❌ Вход не удался — возможно, капча не решена или неверные данные")
+			return False
 		except Exception as e:
 			print(f"[FunPay] Ошибка логина: {e}")
 			import traceback
 			traceback.print_exc()
 			return False
+		finally:
+			await self._set_route_profile(self._page, "default")
 
 	async def login_with_cookie_header(self, cookie_header: str) -> bool:
 		"""Accepts raw Cookie header string, extracts known cookies and applies them to context."""
-		if not self._browser:
+		if not self._context:
 			await self.launch()  # Создаём браузер если его нет
 		
 		from urllib.parse import unquote
@@ -340,37 +882,16 @@ class FunPayClient:
 			for c in cookies:
 				print(f"  - {c['name']}: {c['value'][:20]}...")
 			await self._context.add_cookies(cookies)
-			# Перезагружаем страницу с новыми куками
+			# Проверим, авторизованы ли мы — без загрузки и разбора всей страницы
+			if not await self.probe_auth():
+				print("[FunPay] ❌ Авторизация не прошла — куки не сработали")
+				print(f"[FunPay] Подсказка: проверьте, не истекла ли сессия на FunPay")
+				return False
+			print("[FunPay] ✅ Авторизация успешна!")
+			self.set_auth_state(True)
+			await self._save_storage_state()
 			if self._page:
-				print("[FunPay] Перезагружаю страницу с новыми куками...")
 				await self._page.goto(config.funpay_base_url, wait_until="domcontentloaded")
-				await self._page.wait_for_timeout(3000)
-				# Проверим, авторизованы ли мы
-				html = await self._page.content()
-				
-				# Расширенная проверка авторизации
-				checks = [
-					"account/logout" in html,
-					"Выйти" in html,
-					"menu-item-logout" in html,
-					'href="/account/settings"' in html,
-					"badge-balance" in html
-				]
-				
-				if any(checks):
-					print(f"[FunPay] ✅ Авторизация успешна! (проверки: {sum(checks)}/5)")
-					await self._context.storage_state(path=config.storage_path)
-					return True
-				else:
-					print("[FunPay] ❌ Авторизация не прошла — куки не сработали")
-					print(f"[FunPay] Подсказка: проверьте, не истекла ли сессия на FunPay")
-					# Сохраним HTML для отладки
-					with open("debug_login.html", "w", encoding="utf-8") as f:
-						f.write(html)
-					print("[FunPay] HTML страницы сохранён в debug_login.html")
-					return False
-			await self._context.storage_state(path=config.storage_path)
-			print("[FunPay] Куки применены и сохранены")
 			return True
 		except Exception as e:
 			print(f"[FunPay] Ошибка применения cookies: {e}")
@@ -392,7 +913,7 @@ class FunPayClient:
 		"""Сохранить текущую сессию"""
 		if self._context:
 			try:
-				await self._context.storage_state(path=config.storage_path)
+				await self._save_storage_state()
 				print(f"[FunPay] Сессия сохранена в {config.storage_path}")
 			except Exception as e:
 				print(f"[FunPay] Ошибка сохранения сессии: {e}")
@@ -410,168 +931,135 @@ class FunPayClient:
 	def _save_processed_dialogs(self) -> None:
 		"""Сохранить список обработанных диалогов"""
 		try:
-			os.makedirs(os.path.dirname(self._processed_dialogs_file), exist_ok=True)
-			with open(self._processed_dialogs_file, 'w', encoding='utf-8') as f:
-				json.dump(self._processed_dialogs, f, ensure_ascii=False, indent=2)
+			dump_json(self._processed_dialogs_file, self._processed_dialogs, ensure_ascii=False, indent=2)
 			print(f"[FunPay] Сохранено {len(self._processed_dialogs)} обработанных диалогов")
 		except Exception as e:
 			print(f"[FunPay] Ошибка сохранения обработанных диалогов: {e}")
 
 	async def fetch_balance(self) -> Optional[str]:
-		# быстрый кэш на 10 секунд
+		"""Баланс из кэша; пока работает мониторинг баланса, кэш всегда свежий"""
 		now = time.time()
-		if self._cached_balance and now - self._cached_balance_ts < 10:
+		ttl = max(10, config.balance_check_sec + 10) if self.tasks.running("balance_monitor") else 10
+		if self._cached_balance and now - self._cached_balance_ts < ttl:
 			return self._cached_balance
-		if not self._page:
-			return None
-		selectors = [
-			config.balance_selector,
-			"[data-balance]",
-			".header-balance",
-			".balance",
-		]
-		urls = [
-			config.funpay_base_url,
-			config.funpay_base_url + "account/finance",
-			config.funpay_base_url + "finance",
-			config.funpay_base_url + "account",
-		]
+		return await self.refresh_balance()
+
+	async def refresh_balance(self) -> Optional[str]:
+		"""Перезагружает вкладку финансов и читает баланс из одного элемента (BALANCE_SELECTOR)"""
 		try:
-			for u in urls:
-				await self._page.goto(u, wait_until="domcontentloaded")
-				for sel in selectors:
-					try:
-						el = await self._page.query_selector(sel)
-						if el:
-							text = (await el.inner_text()).strip()
-							if text:
-								await self._save_session()  # Сохраняем сессию после успешного действия
-								self._cached_balance = text
-								self._cached_balance_ts = now
-								return text
-					except Exception:
-						pass
-				# Попытка парсить из текста страницы
-				body_text = await self._page.inner_text("body")
-				m = re.search(r"([\d\s]+(?:[.,]\d{2})?)\s*[₽RUB]", body_text, flags=re.IGNORECASE)
-				if m:
-					await self._save_session()  # Сохраняем сессию после успешного действия
-					val = m.group(0).strip()
-					self._cached_balance = val
-					self._cached_balance_ts = now
-					return val
-			return None
-		except Exception:
+			if not self._context:
+				return None
+			url = config.funpay_base_url + "account/balance"
+			if not self._finance_page or self._finance_page.is_closed():
+				self._finance_page = await self._new_tab("scrape", await self._ensure_scrape_context())
+			if self._finance_page.url == url:
+				await self._finance_page.reload(wait_until="domcontentloaded")
+			else:
+				await self._finance_page.goto(url, wait_until="domcontentloaded")
+			text = clean_text(await self._finance_page.locator(config.balance_selector).first.inner_text(timeout=3000))
+			if not text:
+				return None
+			self._cached_balance = text
+			self._cached_balance_ts = time.time()
+			return text
+		except Exception as e:
+			print(f"[FunPay] Ошибка чтения баланса: {e}")
 			return None
 
 	async def fetch_trade_totals(self) -> Optional[dict]:
-		"""Парсит страницу orders/trade и возвращает суммы по статусам.
+		"""Суммы по статусам за всю историю продаж из локальной базы заказов.
 
 		Возвращает словарь:
 		{
 		  'paid_sum': float, 'paid_count': int,
 		  'closed_sum': float, 'closed_count': int,
 		  'refund_sum': float, 'refund_count': int,
-		  'total_sum': float
+		  'total_sum': float,
+		  'month_sum': float, 'month_count': int,
+		  'synced': bool  # False — первая синхронизация истории ещё идёт
 		}
 		"""
-		# быстрый кэш на 10 секунд
-		now = time.time()
-		if self._cached_trade_totals and now - self._cached_trade_totals_ts < 10:
-			return self._cached_trade_totals
 		try:
-			if not self._browser:
-				await self.launch()
-			assert self._context is not None
-			page = await self._ensure_orders_page()
-			url = config.funpay_base_url + "orders/trade?state=paid"
-			if page.url != url:
-				await page.goto(url, wait_until="domcontentloaded")
-			# Подождём таблицу, но не падаем, если не нашли
-			try:
-				await page.wait_for_selector("table", timeout=3000)
-			except Exception:
-				pass
+			if time.time() - self._trade_sync_ts > config.trade_sync_interval_sec:
+				self._schedule_trade_sync()
+			totals = self._orders.totals()
+			month = self._orders.totals("month", time.strftime("%Y-%m"))
+			result = {"synced": self._orders.full_sync_done}
+			for status in ("paid", "closed", "refund"):
+				result[f"{status}_sum"] = totals.get(status, {}).get("sum", 0.0)
+				result[f"{status}_count"] = totals.get(status, {}).get("count", 0)
+			result["total_sum"] = round(result["paid_sum"] + result["closed_sum"] + result["refund_sum"], 2)
+			result["month_sum"] = round(sum(month.get(st, {}).get("sum", 0.0) for st in ("paid", "closed")), 2)
+			result["month_count"] = sum(month.get(st, {}).get("count", 0) for st in ("paid", "closed"))
+			return result
+		except Exception as e:
+			print(f"[FunPay] Ошибка подсчёта итогов продаж: {e}")
+			return None
 
-			rows = await page.query_selector_all("tr")
-			paid_sum = closed_sum = refund_sum = 0.0
-			paid_count = closed_count = refund_count = 0
+	def top_buyers(self, limit: int = 3) -> list:
+		return self._orders.top_buyers(limit)
 
-			async def extract_sum(text: str) -> Optional[float]:
-				m = re.search(r"([\d\s]+(?:[.,]\d{2})?)\s*[₽RrРр]", text)
-				if not m:
-					return None
-				val = m.group(1).replace(" ", "").replace(",", ".")
-				try:
-					return float(val)
-				except Exception:
-					return None
+	async def export_orders(self, fmt: str = "csv") -> Optional[dict]:
+		"""Выгрузка всей истории продаж в storage/exports/orders.<fmt> (с продолжением после обрыва)"""
+		if not self._context:
+			return None
+		target = os.path.join(config.export_dir, f"orders.{fmt}")
+		return await export_orders(self._context.request, target, fmt, budget=self.rate_budget)
 
-			if rows:
-				for r in rows:
-					try:
-						text = (await r.inner_text()).strip()
-						if not text or ("Дата" in text and "Сумма" in text):
-							continue  # пропустим заголовки
-						amount = await extract_sum(text)
-						if amount is None:
-							continue
-						if "Оплачен" in text:
-							paid_sum += amount
-							paid_count += 1
-						elif "Закрыт" in text:
-							closed_sum += amount
-							closed_count += 1
-						elif "Возврат" in text:
-							refund_sum += amount
-							refund_count += 1
-					except Exception:
-						continue
+	def _schedule_trade_sync(self) -> None:
+		if self._trade_sync_task and not self._trade_sync_task.done():
+			return
+		self._trade_sync_task = self._spawn(self.sync_trade_history())
+
+	async def sync_trade_history(self, full: bool = False, max_pages: int = 500) -> int:
+		"""Постранично обходит историю продаж orders/trade и обновляет локальную базу.
+
+		Пока история ни разу не пройдена до конца, обход полный и продолжается с
+		сохранённого в базе токена страницы. После этого без full обход
+		останавливается на первой странице без изменений, если все оплаченные
+		(ещё не закрытые) заказы из базы уже перепроверены.
+		Возвращает число новых или изменившихся заказов.
+		"""
+		if not self._context:
+			return 0
+		initial = not self._orders.full_sync_done
+		full = full or initial
+		start_token = self._orders.sync_cursor if initial else None
+		pending = self._orders.paid_order_ids()
+		changed_total = pages = 0
+		started = time.monotonic()
+		try:
+			async for orders, token in iter_trade_pages(self._context.request, start_token, budget=self.rate_budget):
+				pages += 1
+				changed = self._orders.upsert(orders)
+				changed_total += changed
+				pending -= {o["order_id"] for o in orders}
+				if initial:
+					self._orders.set_sync_cursor(token)
+				if pages >= max_pages or (not full and not changed and not pending):
+					break
 			else:
-				# Фоллбек: парсим весь текст страницы
-				body_text = await page.inner_text("body")
-				for line in body_text.splitlines():
-					amount = await extract_sum(line)
-					if amount is None:
-						continue
-					if "Оплачен" in line:
-						paid_sum += amount; paid_count += 1
-					elif "Закрыт" in line:
-						closed_sum += amount; closed_count += 1
-					elif "Возврат" in line:
-						refund_sum += amount; refund_count += 1
-
-			result = {
-				"paid_sum": round(paid_sum, 2),
-				"paid_count": paid_count,
-				"closed_sum": round(closed_sum, 2),
-				"closed_count": closed_count,
-				"refund_sum": round(refund_sum, 2),
-				"refund_count": refund_count,
-				"total_sum": round(paid_sum + closed_sum + refund_sum, 2),
-			}
-			await self._save_session()
-			self._cached_trade_totals = result
-			self._cached_trade_totals_ts = now
-			return result
+				# Дошли до последней страницы
+				if initial:
+					self._orders.mark_full_sync_done()
+			self._trade_sync_ts = time.time()
+			print(f"[FunPay] История продаж: {pages} стр., изменений {changed_total}, "
+				f"всего заказов {len(self._orders)} ({time.monotonic() - started:.1f} сек)")
 		except Exception as e:
-			print(f"[FunPay] Ошибка парсинга orders/trade: {e}")
-			try:
-				await self._page.screenshot(path="debug_orders_trade.png")
-			except Exception:
-				pass
-			return None
+			print(f"[FunPay] Ошибка синхронизации истории продаж: {e}")
+		return changed_total
 
 	async def fetch_active_orders(self, limit: int = 10) -> Optional[list]:
 		"""Возвращает список активных заказов (статус 'Оплачен').
 		Список элементов: { 'order_id', 'buyer', 'status', 'amount', 'description', 'date' }
 		"""
-		# быстрый кэш на 10 секунд
+		# быстрый кэш на 10 секунд (пока работает отслеживание заказов — на его интервал)
 		now = time.time()
-		if self._cached_active_orders and now - self._cached_active_orders_ts < 10:
+		ttl = max(10, config.order_watch_interval_sec + 5) if self.tasks.running("order_watcher") else 10
+		if self._cached_active_orders is not None and now - self._cached_active_orders_ts < ttl:
 			return self._cached_active_orders[:limit]
 		try:
-			if not self._browser:
+			if not self._context:
 				await self.launch()
 			assert self._context is not None
 			page = await self._ensure_orders_page()
@@ -701,9 +1189,120 @@ class FunPayClient:
 			print(f"[FunPay] Ошибка получения активных заказов: {e}")
 			return None
 
+	async def fetch_html(self, url: str, page: Optional[Page] = None) -> Optional[str]:
+		"""HTML страницы без навигации и рендера, с cookies текущей сессии.
+
+		FETCH_MODE=request — через context.request; FETCH_MODE=tab — fetch() внутри
+		уже открытой вкладки (page или основной), вкладка при этом остаётся на месте.
+		"""
+		if not self._context:
+			return None
+		if not url.startswith("http"):
+			url = config.funpay_base_url + url.lstrip("/")
+		if config.fetch_mode == "tab":
+			tab = page or self._page
+			if tab and not tab.is_closed():
+				return await tab.evaluate(
+					"async (url) => { const r = await fetch(url, {credentials: 'include'}); return await r.text(); }",
+					url,
+				)
+		resp = await self._context.request.get(url)
+		return await resp.text()
+
+	async def fetch_paid_orders(self) -> Optional[list]:
+		"""Загружает и парсит оплаченные заказы из HTML одним проходом"""
+		try:
+			html = await self.fetch_html("orders/trade?state=paid")
+			if html is None:
+				return None
+			self._app_data = parse_app_data(html) or self._app_data
+			orders = [o for o in parse_orders(html) if is_paid_status(o["status"])]
+			self._orders.upsert(orders)
+			# Заодно обновим кэш для кнопки "Активные заказы"
+			self._cached_active_orders = [
+				dict(o, amount=f"{o['amount']:g}" if o["amount"] is not None else "") for o in orders
+			]
+			self._cached_active_orders_ts = time.time()
+			return orders
+		except Exception as e:
+			print(f"[FunPay] Ошибка обновления оплаченных заказов: {e}")
+			return None
+
+	async def _ensure_send_page(self) -> Page:
+		if not self._send_page or self._send_page.is_closed():
+			if not self._context:
+				await self.launch()
+			self._send_page = await self._new_tab("chat")
+		return self._send_page
+
+	def _private_node(self, buyer_id: Optional[str]) -> Optional[str]:
+		"""node_id личного диалога с пользователем: users-<меньший id>-<больший id>"""
+		user_id = self._app_data.get("userId")
+		if not user_id or not buyer_id:
+			return None
+		a, b = sorted((int(user_id), int(buyer_id)))
+		return f"users-{a}-{b}"
+
+	async def _on_new_order(self, order: dict) -> None:
+		"""Новый оплаченный заказ: сообщение покупателю и уведомление в Telegram одновременно"""
+		if config.order_ack_enabled:
+			await asyncio.gather(self._acknowledge_order(order), self._notify_new_order(order))
+		else:
+			await self._notify_new_order(order)
+
+	async def _acknowledge_order(self, order: dict) -> bool:
+		"""Отправляет покупателю сообщение по шаблону ORDER_ACK_TEXT"""
+		node_id = order.get("node_id") or self._private_node(order.get("buyer_id"))
+		if not node_id:
+			print(f"[Orders] Не удалось определить диалог покупателя заказа {order['order_id']}")
+			return False
+		try:
+			text = config.order_ack_text.format(
+				buyer=order.get("buyer") or "",
+				order_id=order["order_id"],
+				description=order.get("description") or "",
+			)
+		except (KeyError, IndexError, ValueError):
+			text = config.order_ack_text
+		ok = await self.reply_to_dialog(node_id, text, fast=True)
+		latency = time.time() - order.get("detected_at", time.time())
+		print(f"[Orders] Подтверждение заказа {order['order_id']}: {'✅' if ok else '❌'} через {latency:.1f} сек после обнаружения")
+		return ok
+
+	async def _detect_order_in_chat(self, chat_page: Page, dialog_id: Optional[str]) -> None:
+		"""Сообщение FunPay об оплате в открытом диалоге — сразу передаём заказ в обработку"""
+		try:
+			messages = await chat_page.locator(".chat-msg-item").all_inner_texts()
+			for text in messages[-2:]:
+				m = re.search(r"оплатил заказ\s*#([A-Z0-9]{6,})", text)
+				if not m:
+					continue
+				await self.order_watcher.report({
+					"order_id": "#" + m.group(1),
+					"link": f"{config.funpay_base_url}orders/{m.group(1)}/",
+					"description": "",
+					"buyer": "",
+					"buyer_id": None,
+					"node_id": dialog_id if (dialog_id or "").startswith("users-") else None,
+					"status": "Оплачен",
+					"amount": None,
+				})
+		except Exception as e:
+			print(f"[FunPay] Ошибка поиска заказа в диалоге: {e}")
+
+	async def _notify_new_order(self, order: dict) -> None:
+		amount = f"{order['amount']:g} ₽" if order["amount"] is not None else "—"
+		await self.notify(
+			f"🆕 Новый заказ {order['order_id']}\n\n"
+			f"👤 {order['buyer'] or 'покупатель не указан'}\n"
+			f"💰 {amount}\n"
+			f"📝 {order['description'][:150]}\n"
+			f"🔗 {order['link']}"
+		)
+
 	async def get_unread_dialogs(self) -> list:
 		"""Получить список непрочитанных диалогов с именами и ID"""
-		if not self._browser or not self._page or self._page.is_closed():
+		if not self._context or not self._page or self._page.is_closed():
 			await self.launch()
 		try:
 			print("[FunPay] Переход на /chat/...")
@@ -770,22 +1369,115 @@ class FunPayClient:
 			traceback.print_exc()
 			return []
 
-	async def reply_to_dialog(self, node_id: str, text: str) -> bool:
-		"""Отправить сообщение в конкретный диалог по node_id"""
-		if not self._browser:
+	async def reply_to_dialog(self, node_id: str, text: str, fast: bool = False) -> bool:
+		"""Отправить сообщение в конкретный диалог по node_id.
+
+		Сначала — прямой запрос к runner/ без браузерной формы; если FunPay его
+		явно отклонил, сообщение отправляется через форму чата во вкладке.
+		При неясном исходе (обрыв, непонятный ответ) сначала смотрим последнее
+		сообщение диалога, чтобы не отправить покупателю дубль.
+		"""
+		if not self._context:
 			await self.launch()
+		sent = await self._send_via_runner(node_id, text)
+		if sent is None:
+			sent = await self._last_message_is(node_id, text)
+			if sent is None:
+				print(f"[FunPay] Не удалось проверить диалог {node_id} — повторно не отправляю")
+				return False
+		if sent:
+			return True
+		return await self._reply_via_form(node_id, text, fast)
+
+	async def _last_message_is(self, node_id: str, text: str) -> Optional[bool]:
+		"""Совпадает ли последнее сообщение диалога с text; None — проверить не удалось"""
+		try:
+			messages = parse_chat_messages(await self.fetch_html(f"chat/?node={node_id}") or "")
+		except Exception as e:
+			print(f"[FunPay] Ошибка чтения диалога {node_id}: {e}")
+			return None
+		if not messages:
+			return None
+		delivered = messages[-1] == clean_text(text)
+		if delivered:
+			print(f"[FunPay] Сообщение в {node_id} уже доставлено, повтор не нужен")
+		return delivered
+
+	async def _csrf_token(self, refresh: bool = False) -> Optional[str]:
+		"""csrf-token из data-app-data (при необходимости — с лёгкой загрузки главной)"""
+		if refresh or not self._app_data.get("csrf-token"):
+			html = await self.fetch_html(config.funpay_base_url)
+			self._app_data = parse_app_data(html or "") or self._app_data
+		return self._app_data.get("csrf-token")
+
+	async def _send_via_runner(self, node_id: str, text: str) -> Optional[bool]:
+		"""Отправка сообщения POST-запросом на runner/ (как это делает сам чат FunPay).
+
+		True — отправлено; False — FunPay явно отклонил (ошибка в ответе или отказ
+		по csrf), сообщение точно не ушло; None — исход неизвестен (обрыв, 5xx,
+		непонятный ответ), повторять вслепую нельзя.
+		"""
+		started = time.monotonic()
+		for attempt in range(2):
+			try:
+				csrf = await self._csrf_token(refresh=attempt > 0)
+			except Exception as e:
+				print(f"[FunPay] Ошибка получения csrf-token: {e}")
+				return False
+			if not csrf or not self._context:
+				return False
+			request = {"action": "chat_message", "data": {"node": node_id, "last_message": -1, "content": text}}
+			try:
+				resp = await self._context.request.post(
+					config.funpay_base_url + "runner/",
+					form={"objects": "[]", "request": json.dumps(request, ensure_ascii=False), "csrf_token": csrf},
+					headers={"X-Requested-With": "XMLHttpRequest", "Accept": "application/json, text/javascript, */*; q=0.01"},
+				)
+			except Exception as e:
+				print(f"[FunPay] Ошибка отправки через runner: {e}")
+				return None
+			if resp.status in (400, 403, 419):
+				# Отказ до обработки сообщения (обычно устаревший csrf-token) — можно повторить
+				print(f"[FunPay] runner отклонил запрос в {node_id}: HTTP {resp.status}")
+				continue
+			try:
+				data = await resp.json() if resp.ok else None
+			except Exception:
+				data = None
+			if not isinstance(data, dict):
+				print(f"[FunPay] Непонятный ответ runner для {node_id}: HTTP {resp.status}")
+				return None
+			response = data.get("response")
+			error = data.get("error") or (response.get("error") if isinstance(response, dict) else None)
+			if error:
+				print(f"[FunPay] runner отклонил сообщение в {node_id}: {error}")
+				continue
+			if isinstance(response, dict):
+				print(f"[FunPay] ✅ Отправлено в диалог {node_id} через runner за {time.monotonic() - started:.2f} сек")
+				return True
+			print(f"[FunPay] Непонятный ответ runner для {node_id}: {str(data)[:100]}")
+			return None
+		return False
+
+	async def _reply_via_form(self, node_id: str, text: str, fast: bool = False) -> bool:
+		"""Отправка через форму чата во вкладке.
+
+		fast=True — отдельная вкладка, без ожидания networkidle и фиксированных пауз.
+		"""
 		try:
 			print(f"[FunPay] Открываю диалог {node_id}...")
-			await self._page.goto(f"https://funpay.com/chat/?node={node_id}", wait_until="networkidle")
+			page = await self._ensure_send_page() if fast else self._page
+			await page.goto(f"https://funpay.com/chat/?node={node_id}", wait_until="domcontentloaded" if fast else "networkidle")
 			
 			# Ждём появления формы чата
 			try:
-				await self._page.wait_for_selector(".chat-form", timeout=5000)
+				await page.wait_for_selector(".chat-form", timeout=5000)
 				print("[FunPay] Форма чата загружена")
 			except Exception:
 				print("[FunPay] Форма чата не найдена")
 			
-			await self._page.wait_for_timeout(1500)
+			if not fast:
+				await page.wait_for_timeout(1500)
 			
 			# Попробуем разные селекторы с использованием locator
 			selectors = [
@@ -798,7 +1490,7 @@ class FunPayClient:
 			reply_locator = None
 			for sel in selectors:
 				try:
-					loc = self._page.locator(sel).first
+					loc = page.locator(sel).first
 					await loc.wait_for(state="visible", timeout=2000)
 					reply_locator = loc
 					print(f"[FunPay] Найден инпут: {sel}")
@@ -823,7 +1515,7 @@ class FunPayClient:
 			sent = False
 			for sel in send_selectors:
 				try:
-					btn = self._page.locator(sel).first
+					btn = page.locator(sel).first
 					await btn.click(timeout=2000)
 					print(f"[FunPay] Кликнул кнопку: {sel}")
 					sent = True
@@ -1311,6 +2003,10 @@ class FunPayClient:
 
 	async def test_auto_reply(self) -> bool:
 		"""Тест автоответа - отправить сообщение в первый доступный диалог"""
+		async with self._tab_locks["chat"]:
+			return await self._test_auto_reply()
+
+	async def _test_auto_reply(self) -> bool:
 		chat_page = self._chat_page or self._page
 		if not chat_page:
 			print("[FunPay] Нет вкладки для чатов")
@@ -1378,9 +2074,106 @@ class FunPayClient:
 
 	async def _periodic_poster(self) -> None:
 		while self._running:
-			await self._send_to_chat_once()
+			async with self._tab_locks["services"]:
+				await self._send_to_chat_once()
 			await asyncio.sleep(self._post_interval_sec)
 
+	async def _check_chats_once(self, chat_page: Page) -> None:
+		"""Одна проверка чатов: открыть диалог с новым сообщением и ответить"""
+		# Переходим на страницу чатов
+		if not chat_page.url.startswith("https://funpay.com/chat"):
+			await chat_page.goto("https://funpay.com/chat/", wait_until="domcontentloaded")
+			await asyncio.sleep(0.3)
+		
+		# Ищем диалоги с новыми сообщениями
+		unread_selectors = [
+			config.unread_dialog_selector,
+			".contact-list a.contact-item.unread",
+			".contact-item.unread",
+			"a.contact-item.unread",
+			".unread",
+			"[class*='unread']"
+		]
+		
+		dialog = None
+		for selector in unread_selectors:
+			try:
+				dialog = await chat_page.query_selector(selector)
+				if dialog:
+					print(f"[FunPay] Найден диалог с новым сообщением во время ожидания: {selector}")
+					break
+			except Exception:
+				continue
+		
+		if dialog:
+			# Получаем ID диалога
+			dialog_id = None
+			try:
+				dialog_id = await dialog.get_attribute("data-id")
+				if not dialog_id:
+					dialog_id = await dialog.get_attribute("href")
+				if not dialog_id:
+					dialog_id = str(hash(await dialog.get_attribute("href") or "unknown"))
+			except Exception:
+				dialog_id = "unknown"
+			
+			# Проверяем, не отвечали ли мы недавно
+			current_time = time.time()
+			should_reply = True
+			if dialog_id in self._processed_dialogs:
+				last_reply_time = self._processed_dialogs[dialog_id]
+				if isinstance(last_reply_time, (int, float)):
+					time_since_last = current_time - last_reply_time
+					if time_since_last < 120:  # 2 минуты
+						should_reply = False
+						print(f"[FunPay] >> Диалог {dialog_id} обработан недавно, пропускаю")
+			
+			if should_reply:
+				print("[FunPay] >> Открываю диалог для автоответа во время ожидания!")
+				
+				# Кликаем на диалог
+				await dialog.click()
+				await chat_page.wait_for_load_state("domcontentloaded")
+				await asyncio.sleep(0.8)
+				await self._detect_order_in_chat(chat_page, dialog_id)
+				
+				# Ищем поле ввода
+				editor_selectors = [
+					"textarea[name='content']",
+					config.dialog_reply_input_selector,
+					"textarea#message",
+					"textarea",
+				]
+				
+				reply_elem = None
+				for sel in editor_selectors:
+					try:
+						reply_elem = await chat_page.wait_for_selector(sel, timeout=1500)
+						if reply_elem:
+							break
+					except Exception:
+						continue
+				
+				if reply_elem:
+					# Заполняем текст
+					await reply_elem.fill(config.auto_reply_text)
+					print(f"[FunPay] >> Отправляю автоответ: {config.auto_reply_text[:40]}...")
+					
+					# Нажимаем Enter для отправки
+					await reply_elem.press("Enter")
+					
+					# Отмечаем диалог сразу после отправки, до следующих ожиданий
+					self._processed_dialogs[dialog_id] = current_time
+					self._save_processed_dialogs()
+					await self._save_session()
+					print("[FunPay] >> Автоответ отправлен во время ожидания!")
+					print(f"[FunPay] >> Диалог {dialog_id} отмечен как обработанный")
+				else:
+					print("[FunPay] >> Не нашёл поле ввода")
+				
+				# Возвращаемся к услугам
+				await asyncio.sleep(1)
+
 	async def _check_chats_during_wait(self, wait_time: int) -> None:
 		"""Проверяет чаты во время ожидания между отправками в услуги"""
 		if not config.auto_reply_enabled:
@@ -1398,108 +2191,23 @@ class FunPayClient:
 		
 		while remaining_time > 0 and self._running:
 			try:
-				# Переходим на страницу чатов
-				if not chat_page.url.startswith("https://funpay.com/chat"):
-					await chat_page.goto("https://funpay.com/chat/", wait_until="domcontentloaded")
-					await asyncio.sleep(0.3)
-				
-				# Ищем диалоги с новыми сообщениями
-				unread_selectors = [
-					config.unread_dialog_selector,
-					".contact-list a.contact-item.unread",
-					".contact-item.unread",
-					"a.contact-item.unread",
-					".unread",
-					"[class*='unread']"
-				]
-				
-				dialog = None
-				for selector in unread_selectors:
-					try:
-						dialog = await chat_page.query_selector(selector)
-						if dialog:
-							print(f"[FunPay] Найден диалог с новым сообщением во время ожидания: {selector}")
-							break
-					except Exception:
-						continue
-				
-				if dialog:
-					# Получаем ID диалога
-					dialog_id = None
-					try:
-						dialog_id = await dialog.get_attribute("data-id")
-						if not dialog_id:
-							dialog_id = await dialog.get_attribute("href")
-						if not dialog_id:
-							dialog_id = str(hash(await dialog.get_attribute("href") or "unknown"))
-					except Exception:
-						dialog_id = "unknown"
-					
-					# Проверяем, не отвечали ли мы недавно
-					current_time = time.time()
-					should_reply = True
-					if dialog_id in self._processed_dialogs:
-						last_reply_time = self._processed_dialogs[dialog_id]
-						if isinstance(last_reply_time, (int, float)):
-							time_since_last = current_time - last_reply_time
-							if time_since_last < 120:  # 2 минуты
-								should_reply = False
-								print(f"[FunPay] >> Диалог {dialog_id} обработан недавно, пропускаю")
-					
-					if should_reply:
-						print("[FunPay] >> Открываю диалог для автоответа во время ожидания!")
-						
-						# Кликаем на диалог
-						await dialog.click()
-						await chat_page.wait_for_load_state("domcontentloaded")
-						await asyncio.sleep(0.8)
-						
-						# Ищем поле ввода
-						editor_selectors = [
-							"textarea[name='content']",
-							config.dialog_reply_input_selector,
-							"textarea#message",
-							"textarea",
-						]
-						
-						reply_elem = None
-						for sel in editor_selectors:
-							try:
-								reply_elem = await chat_page.wait_for_selector(sel, timeout=1500)
-								if reply_elem:
-									break
-							except Exception:
-								continue
-						
-						if reply_elem:
-							# Заполняем текст
-							await reply_elem.fill(config.auto_reply_text)
-							print(f"[FunPay] >> Отправляю автоответ: {config.auto_reply_text[:40]}...")
-							
-							# Нажимаем Enter для отправки
-							await reply_elem.press("Enter")
-							
-							await self._save_session()
-							print("[FunPay] >> Автоответ отправлен во время ожидания!")
-							
-							# Отмечаем диалог как обработанный
-							self._processed_dialogs[dialog_id] = current_time
-							self._save_processed_dialogs()
-							print(f"[FunPay] >> Диалог {dialog_id} отмечен как обработанный")
-						else:
-							print("[FunPay] >> Не нашёл поле ввода")
-						
-						# Возвращаемся к услугам
-						await asyncio.sleep(1)
+				if not self._auth_ok.is_set():
+					# Сессия истекла — не трогаем чаты, просто ждём
+					await asyncio.sleep(check_interval)
+					remaining_time -= check_interval
+					continue
+				async with self._tab_locks["chat"]:
+					# Вкладку берём заново: между проверками её могли пересоздать
+					await self._check_chats_once(self._chat_page or self._page)
 				
 				# Ждём до следующей проверки
 				sleep_time = min(check_interval, remaining_time)
-				await asyncio.sleep(sleep_time)
+				await self._pause(sleep_time)
 				remaining_time -= sleep_time
 				
 			except Exception as e:
 				print(f"[FunPay] Ошибка проверки чатов во время ожидания: {e}")
-				await asyncio.sleep(check_interval)
+				await self._pause(check_interval)
 				remaining_time -= check_interval
 
 	async def _services_auto_post_loop(self) -> None:
@@ -1518,17 +2226,17 @@ class FunPayClient:
 		print(f"[FunPay] Запущена постоянная отправка в услуги (интервал: {interval} сек)")
 		print(f"[FunPay] Текст: {self._post_text[:50]}...")
 		
+		# Ошибки не глушим: перезапуск с нарастающей задержкой и last_error в статусе — на TaskSupervisor
 		while self._running:
-			try:
+			await self.wait_logged_in()
+			if self._recycle_pending:
+				await self.recycle_pending_tabs()
+			async with self._tab_locks["services"]:
 				await self._send_to_chat_once()
-				print(f"[FunPay] Жду {interval} секунд до следующей отправки...")
-				
-				# Во время ожидания проверяем чаты на новые сообщения
-				await self._check_chats_during_wait(interval)
-				
-			except Exception as e:
-				print(f"[FunPay] Ошибка в цикле услуг: {e}")
-				await asyncio.sleep(5)  # Ждём 5 секунд при ошибке
+			print(f"[FunPay] Жду {interval} секунд до следующей отправки...")
+			
+			# Во время ожидания проверяем чаты на новые сообщения
+			await self._check_chats_during_wait(interval)
 
 	async def _auto_reply_and_screenshot_loop(self) -> None:
 		"""Объединённый процесс: проверяет новые сообщения, делает скриншот и отправляет автоответ"""
@@ -1551,134 +2259,138 @@ class FunPayClient:
 		
 		while self._running:
 			try:
-				# Обновляем страницу чатов если нужно
-				if not chat_page.url.startswith("https://funpay.com/chat"):
-					await chat_page.goto("https://funpay.com/chat/", wait_until="domcontentloaded")
-					await asyncio.sleep(0.3)
+				await self.wait_logged_in()
+				if self._recycle_pending:
+					await self.recycle_pending_tabs()
+				async with self._tab_locks["chat"]:
+					chat_page = self._chat_page or self._page
+					# Обновляем страницу чатов если нужно
+					if not chat_page.url.startswith("https://funpay.com/chat"):
+						await chat_page.goto("https://funpay.com/chat/", wait_until="domcontentloaded")
+						await asyncio.sleep(0.3)
 				
-				# Ищем ВСЕ диалоги (и непрочитанные, и обычные)
-				all_dialog_selectors = [
-					config.unread_dialog_selector,
-					".contact-list a.contact-item.unread",
-					".contact-item.unread", 
-					"a.contact-item.unread",
-					".unread",
-					"[class*='unread']",
-					".contact-list a.contact-item",
-					".contact-item",
-					"a.contact-item"
-				]
+					# Ищем ВСЕ диалоги (и непрочитанные, и обычные)
+					all_dialog_selectors = [
+						config.unread_dialog_selector,
+						".contact-list a.contact-item.unread",
+						".contact-item.unread", 
+						"a.contact-item.unread",
+						".unread",
+						"[class*='unread']",
+						".contact-list a.contact-item",
+						".contact-item",
+						"a.contact-item"
+					]
 				
-				dialog = None
-				for selector in all_dialog_selectors:
-					try:
-						dialog = await chat_page.query_selector(selector)
-						if dialog:
-							print(f"[FunPay] Найден диалог: {selector}")
-							break
-					except Exception:
-						continue
+					dialog = None
+					for selector in all_dialog_selectors:
+						try:
+							dialog = await chat_page.query_selector(selector)
+							if dialog:
+								print(f"[FunPay] Найден диалог: {selector}")
+								break
+						except Exception:
+							continue
 				
-				if dialog:
-					# Получаем ID диалога для защиты от спама
-					dialog_id = None
-					try:
-						dialog_id = await dialog.get_attribute("data-id")
-						if not dialog_id:
-							dialog_id = await dialog.get_attribute("href")
-						if not dialog_id:
-							dialog_id = str(hash(await dialog.get_attribute("href") or "unknown"))
-					except Exception:
-						dialog_id = "unknown"
+					if dialog:
+						# Получаем ID диалога для защиты от спама
+						dialog_id = None
+						try:
+							dialog_id = await dialog.get_attribute("data-id")
+							if not dialog_id:
+								dialog_id = await dialog.get_attribute("href")
+							if not dialog_id:
+								dialog_id = str(hash(await dialog.get_attribute("href") or "unknown"))
+						except Exception:
+							dialog_id = "unknown"
 					
-					# Проверяем, не отвечали ли мы недавно в этот диалог
-					current_time = time.time()
-					if dialog_id in self._processed_dialogs:
-						last_reply_time = self._processed_dialogs[dialog_id]
-						if isinstance(last_reply_time, (int, float)):
-							time_since_last = current_time - last_reply_time
-							# Если прошло меньше 2 минут, пропускаем
-							if time_since_last < 120:  # 2 минуты
-								print(f"[FunPay] >> Диалог {dialog_id} обработан недавно ({time_since_last:.1f}с назад), пропускаю")
-								await asyncio.sleep(2)
-								continue
+						# Проверяем, не отвечали ли мы недавно в этот диалог
+						current_time = time.time()
+						if dialog_id in self._processed_dialogs:
+							last_reply_time = self._processed_dialogs[dialog_id]
+							if isinstance(last_reply_time, (int, float)):
+								time_since_last = current_time - last_reply_time
+								# Если прошло меньше 2 минут, пропускаем
+								if time_since_last < 120:  # 2 минуты
+									print(f"[FunPay] >> Диалог {dialog_id} обработан недавно ({time_since_last:.1f}с назад), пропускаю")
+									await asyncio.sleep(2)
+									continue
 					
-					# Проверяем, не открыт ли уже этот диалог
-					current_url = chat_page.url
-					if dialog_id in current_url or "chat" in current_url:
-						print(f"[FunPay] >> Диалог {dialog_id} уже открыт, пропускаю")
-						await asyncio.sleep(5)
-						continue
+						# Проверяем, не открыт ли уже этот диалог
+						current_url = chat_page.url
+						if dialog_id in current_url or "chat" in current_url:
+							print(f"[FunPay] >> Диалог {dialog_id} уже открыт, пропускаю")
+							await asyncio.sleep(5)
+							continue
 					
-					print("[FunPay] >> Открываю диалог для автоответа!")
+						print("[FunPay] >> Открываю диалог для автоответа!")
 					
-					# Кликаем на диалог
-					await dialog.click()
-					await chat_page.wait_for_load_state("domcontentloaded")
-					await asyncio.sleep(0.8)
+						# Кликаем на диалог
+						await dialog.click()
+						await chat_page.wait_for_load_state("domcontentloaded")
+						await asyncio.sleep(0.8)
+						await self._detect_order_in_chat(chat_page, dialog_id)
 					
-					# Диалог не обработан, продолжаем
+						# Диалог не обработан, продолжаем
 					
-					# 1. СНАЧАЛА ДЕЛАЕМ СКРИНШОТ (чтобы ты видел, что написали)
-					if self._screenshot_callback:
-						try:
-							screenshot_path = "storage/new_message.png"
-							await chat_page.screenshot(path=screenshot_path, full_page=False)
-							print(f"[FunPay] >> Скриншот сохранён")
+						# 1. СНАЧАЛА ДЕЛАЕМ СКРИНШОТ (чтобы ты видел, что написали)
+						if self._screenshot_callback:
+							try:
+								screenshot_path = "storage/new_message.png"
+								await chat_page.screenshot(path=screenshot_path, full_page=False)
+								print(f"[FunPay] >> Скриншот сохранён")
 							
-							# Отправляем скриншот в Telegram
-							await self._screenshot_callback(screenshot_path, None)
-						except Exception as e:
-							print(f"[FunPay] Ошибка скриншота: {e}")
+								# Отправляем скриншот в Telegram
+								await self._outbound(self._screenshot_callback(screenshot_path, None))
+							except Exception as e:
+								print(f"[FunPay] Ошибка скриншота: {e}")
 					
-					# 2. ПОТОМ ОТПРАВЛЯЕМ АВТООТВЕТ
-					# Ищем поле ввода
-					editor_selectors = [
-						"textarea[name='content']",
-						config.dialog_reply_input_selector,
-						"textarea#message",
-						"textarea",
-					]
+						# 2. ПОТОМ ОТПРАВЛЯЕМ АВТООТВЕТ
+						# Ищем поле ввода
+						editor_selectors = [
+							"textarea[name='content']",
+							config.dialog_reply_input_selector,
+							"textarea#message",
+							"textarea",
+						]
 					
-					reply_elem = None
-					for sel in editor_selectors:
-						try:
-							reply_elem = await chat_page.wait_for_selector(sel, timeout=1500)
-							if reply_elem:
-								break
-						except Exception:
-							continue
+						reply_elem = None
+						for sel in editor_selectors:
+							try:
+								reply_elem = await chat_page.wait_for_selector(sel, timeout=1500)
+								if reply_elem:
+									break
+							except Exception:
+								continue
 					
-					if reply_elem:
-						# Заполняем текст
-						await reply_elem.fill(config.auto_reply_text)
-						print(f"[FunPay] >> Отправляю автоответ: {config.auto_reply_text[:40]}...")
-						
-						# Нажимаем Enter для отправки
-						await reply_elem.press("Enter")
+						if reply_elem:
+							# Заполняем текст
+							await reply_elem.fill(config.auto_reply_text)
+							print(f"[FunPay] >> Отправляю автоответ: {config.auto_reply_text[:40]}...")
 						
-						await self._save_session()
-						print("[FunPay] >> Автоответ отправлен!")
+							# Нажимаем Enter для отправки
+							await reply_elem.press("Enter")
 						
-						# Отмечаем диалог как обработанный на 2 минуты
-						self._processed_dialogs[dialog_id] = current_time
-						self._save_processed_dialogs()  # Сохраняем в файл
-						print(f"[FunPay] >> Диалог {dialog_id} отмечен как обработанный на 2 минуты")
+							# Отмечаем диалог как обработанный на 2 минуты (сразу после отправки)
+							self._processed_dialogs[dialog_id] = current_time
+							self._save_processed_dialogs()  # Сохраняем в файл
+							await self._save_session()
+							print("[FunPay] >> Автоответ отправлен!")
+							print(f"[FunPay] >> Диалог {dialog_id} отмечен как обработанный на 2 минуты")
+						else:
+							print("[FunPay] >> Не нашёл поле ввода")
 					else:
-						print("[FunPay] >> Не нашёл поле ввода")
-					
-					# Ждём перед следующей проверкой
-					await asyncio.sleep(2.0)
-				else:
-					# Нет диалогов, ждём
-					print("[FunPay] Диалоги не найдены, жду...")
-					await asyncio.sleep(2.0)
+						# Нет диалогов, ждём
+						print("[FunPay] Диалоги не найдены, жду...")
+				
+				# Ждём перед следующей проверкой, вкладку уже отпустили
+				await self._pause(2.0)
 					
 			except Exception as e:
 				print(f"[FunPay] Ошибка мониторинга: {e}")
 				import traceback
 				traceback.print_exc()
-				await asyncio.sleep(5)
+				await self._pause(5)
 
 	async def start(self) -> None:
 		if self._running:
@@ -1688,15 +2400,297 @@ class FunPayClient:
 		self._load_processed_dialogs()
 		
 		self._running = True
+		self._stop_event.clear()
 		# Запускаем только цикл услуг (автоответ встроен в него)
-		asyncio.create_task(self._services_auto_post_loop())
+		self.tasks.start("services", self._services_auto_post_loop)
 
 	async def stop(self) -> None:
 		self._running = False
+		# Ожидания цикла прерываются, он выходит в безопасной точке; зависший — отменяем
+		self._stop_event.set()
+		await self.tasks.stop("services", grace=2.0)
+
+	async def _record_market_snapshot(self, category: int, html: str) -> Optional[dict]:
+		"""Сохраняет распарсенный список лотов страницы в историю рынка (только изменения)"""
+		try:
+			lots = parse_lot_listing(html)
+			if not lots:
+				return None
+			self._snapshots[category] = {"ts": time.time(), "lots": lots}
+			diff = self._market.record_snapshot(category, lots)
+			self._observe_prices(category, diff["new"] + diff["changed"])
+			if category == 221:
+				self._account_index.rebuild(lots, server=config.market_server)
+			await self._notify_alerts(category, diff)
+			print(f"[FunPay] Снимок рынка {category}: {len(lots)} лотов, новых {len(diff['new'])}, "
+				f"изменений цены {len(diff['changed'])}, снято {len(diff['removed'])}")
+			return diff
+		except Exception as e:
+			print(f"[FunPay] Ошибка сохранения снимка рынка: {e}")
+			return None
+
+	async def notify(self, text: str) -> None:
+		"""Отправляет текстовое уведомление администратору (если Telegram подключён)"""
+		if not self._alert_callback:
+			return
+		try:
+			await self._outbound(self._alert_callback(text))
+		except Exception as e:
+			print(f"[FunPay] Ошибка отправки уведомления: {e}")
+
+	async def _notify_alerts(self, category: int, diff: dict) -> None:
+		"""Проверяет правила по изменившимся лотам и отправляет совпадения в Telegram"""
+		if diff.get("initial"):
+			return
+		for rule, lot in self.alerts.evaluate(category, diff):
+			await self.notify(
+				f"🔔 Сработало правило {rule.describe()}\n\n"
+				f"💰 {lot['price']:g} ₽ — {lot.get('seller') or 'продавец не указан'}\n"
+				f"📝 {(lot.get('description') or '')[:100]}\n"
+				f"🔗 {lot.get('link')}"
+			)
+
+	async def _ensure_reprice_page(self) -> Page:
+		if not self._reprice_page or self._reprice_page.is_closed():
+			if not self._context:
+				await self.launch()
+			self._reprice_page = await self._new_tab("chat")
+		return self._reprice_page
+
+	async def fetch_own_offers(self, category: int) -> Optional[list]:
+		"""Наши лоты категории со страницы lots/<категория>/trade"""
+		try:
+			await self.rate_budget.acquire()
+			offers = parse_own_offers(await self.fetch_html(f"lots/{category}/trade") or "")
+			print(f"[FunPay] Наших лотов в категории {category}: {len(offers)}")
+			return offers
+		except Exception as e:
+			print(f"[FunPay] Ошибка получения своих лотов: {e}")
+			return None
+
+	async def update_offer_price(self, category: int, offer_id: str, price: float) -> bool:
+		"""Меняет цену нашего лота через форму редактирования"""
+		try:
+			page = await self._ensure_reprice_page()
+			await self.rate_budget.acquire()
+			await page.goto(f"{config.funpay_base_url}lots/offerEdit?node={category}&offer={offer_id}", wait_until="domcontentloaded")
+			price_input = page.locator("input[name='price']").first
+			await price_input.wait_for(state="visible", timeout=5000)
+			await price_input.fill(f"{price:g}")
+			
+			save_selectors = [
+				"button.js-btn-save",
+				"button:has-text('Сохранить')",
+				"form button[type='submit']",
+			]
+			for sel in save_selectors:
+				btn = page.locator(sel).first
+				if await btn.count() == 0:
+					continue
+				async with page.expect_response(lambda r: "offerSave" in r.url, timeout=10000) as resp_info:
+					await btn.click(timeout=3000)
+				resp = await resp_info.value
+				ok = resp.ok and '"error"' not in (await resp.text())
+				print(f"[FunPay] Цена лота {offer_id} -> {price:g} ₽: {'✅' if ok else '❌'}")
+				return ok
+			print(f"[FunPay] Кнопка сохранения лота {offer_id} не найдена")
+			return False
+		except Exception as e:
+			print(f"[FunPay] Ошибка обновления цены лота {offer_id}: {e}")
+			return False
+
+	def fresh_snapshot(self, category: int) -> Optional[dict]:
+		"""Последний снимок категории, если он не старше MARKET_SNAPSHOT_MAX_AGE_SEC"""
+		snapshot = self._snapshots.get(category)
+		if snapshot and time.time() - snapshot["ts"] <= config.market_snapshot_max_age_sec:
+			return snapshot
+		return None
+
+	def snapshot_ages(self) -> dict:
+		now = time.time()
+		return {category: now - snap["ts"] for category, snap in self._snapshots.items()}
+
+	@staticmethod
+	def _on_market_server(lot: dict) -> bool:
+		server = (lot.get("server") or "").lower()
+		return not server or server == config.market_server.lower()
+
+	async def crawl_listing(self, category: int) -> Optional[dict]:
+		"""Загружает lots/<категория>/ без вкладки и сохраняет снимок"""
+		html = await self.fetch_html(f"lots/{category}/")
+		if not html:
+			return None
+		return await self._record_market_snapshot(category, html)
+
+	def _observe_prices(self, category: int, lots: list) -> None:
+		"""Обновляет скетчи цен новыми и переоценёнными лотами (каждый листинг учитывается один раз)"""
+		groups: dict = {}
+		for lot in lots:
+			server = lot.get("server")
+			groups.setdefault(PriceSketches.key(category, server), []).append(lot["price"])
+			if lot.get("tier"):
+				groups.setdefault(PriceSketches.key(category, server, lot["tier"]), []).append(lot["price"])
+		for key, prices in groups.items():
+			self.price_sketches.observe(key, prices)
+		self.price_sketches.save()
+
+	def _recommend_price(self, key: str, prices: list, minimum: float = 0.01) -> tuple:
+		"""Рекомендация по скетчу: (рекомендуемая цена, опорная цена, строки для отчёта)"""
+		rec = self.price_sketches.recommend(key, prices, undercut=config.price_undercut_percent / 100, minimum=minimum)
+		if not rec:
+			return prices[0], prices[0], []
+		notes = []
+		if rec["p10"] is not None:
+			notes.append(f"• p10 рынка: {rec['p10']:.2f} | медиана: {rec['median']:.2f}")
+		if rec["rejected"]:
+			notes.append(f"• Отсеяно выбросов: {rec['rejected']}")
+		return rec["recommended"], rec["anchor"], notes
+
+	def market_trend(self, donate_name: Optional[str] = None, days: int = 7) -> str:
+		"""Тренд цен на аккаунты по донату из локальной истории рынка (без парсинга)"""
+		since = time.time() - days * 86400
+		series = self._market.price_series(221, tier=donate_name, server=config.market_server, since=since)
+		title = donate_name.capitalize() if donate_name else "все донаты"
+		if not series:
+			return f"❌ В истории нет данных по '{title}'. Запустите анализ аккаунтов, чтобы собрать снимок."
+		lines = [f"📈 **Тренд цен: {title}** (за {days} дн., сервер {config.market_server})", ""]
+		for point in series:
+			day = time.strftime("%d.%m", time.localtime(point["ts"]))
+			lines.append(f"• {day}: мин {point['min']:.0f} руб, средняя {point['avg']:.0f} руб ({point['count']} лотов)")
+		active = self._market.active_lots(221, tier=donate_name, server=config.market_server)
+		if active:
+			lines.append(f"\n🟢 Сейчас выставлено: {len(active)}, от {active[0]['price']:.0f} руб")
+		tom = self._market.time_on_market(221, tier=donate_name, since=since)
+		if tom["count"]:
+			lines.append(f"⏱ Время на рынке: медиана {tom['median_hours']:.1f} ч ({tom['count']} снятых лотов)")
+		competitors = self._market.competitor_activity(221, tier=donate_name, since=since, limit=5)
+		if competitors:
+			lines.append("\n👥 **Активность конкурентов:**")
+			for c in competitors:
+				lines.append(f"• {c['seller']}: новых {c['new']}, снижений {c['cuts']}, повышений {c['raises']}, снято {c['removed']}")
+		return "\n".join(lines)
+
+	def _currency_report(self, prices: list, age: Optional[float] = None) -> str:
+		"""Отчёт по ценам валюты (за 1кк); age — возраст снимка рынка, если ответ из обхода"""
+		# Анализируем цены
+		prices.sort()
+		min_price = prices[0]
+		max_price = prices[-1]
+		avg_price = sum(prices) / len(prices)
+		
+		# Находим медиану
+		n = len(prices)
+		if n % 2 == 0:
+			median = (prices[n//2-1] + prices[n//2]) / 2
+		else:
+			median = prices[n//2]
+		
+		# Рекомендация по квантильному скетчу: один "троллинговый" лот не задаёт цену
+		recommended_price, anchor_price, sketch_notes = self._recommend_price(
+			PriceSketches.key(1596, config.market_server), prices
+		)
+		
+		# Форматируем цены для понятности
+		def format_price(price):
+			if price < 1:
+				kopecks = int(price * 100)
+				return f"{kopecks} копеек"
+			else:
+				rubles = int(price)
+				kopecks = int((price - rubles) * 100)
+				if kopecks == 0:
+					return f"{rubles} рублей"
+				else:
+					return f"{rubles} руб {kopecks} коп"
+		
+		result = f"""🔍 **FunTime анализ**
+
+📊 **Цены за 1кк валюты:**
+• Минимальная: {format_price(min_price)}
+• Максимальная: {format_price(max_price)}
+• Средняя: {format_price(avg_price)}
+• Всего предложений: {len(prices)}
+
+{chr(10).join(sketch_notes)}
+
+💡 **Рекомендация: {format_price(recommended_price)}** за 1кк
+⬇️ На {((anchor_price - recommended_price) / anchor_price * 100):.0f}% ниже самой дешёвой правдоподобной ({format_price(anchor_price)})"""
+		if age is not None:
+			result += f"\n\n🕒 Данные обхода рынка: {age:.0f} сек назад"
+		
+		return result
+
+	def _account_report(self, prices: list, donate_name: Optional[str], age: Optional[float] = None) -> str:
+		"""Отчёт по ценам аккаунтов с донатом; age — возраст снимка рынка, если ответ из обхода"""
+		donate_display = {
+			"герцог": "Герцог навсегда",
+			"князь": "Князь навсегда", 
+			"глава": "Глава",
+			"титан": "Титан",
+			"элита": "Элита",
+			"принц": "Принц"
+		}
+		search_donate = donate_display.get(donate_name, donate_name) if donate_name else None
+		
+		# Сортируем цены для анализа
+		prices.sort()
+		min_price = prices[0]
+		max_price = prices[-1]
+		avg_price = sum(prices) / len(prices)
+		
+		print(f"[FunPay] После сортировки: мин={min_price}, макс={max_price}, средняя={avg_price:.2f}")
+		
+		# Рекомендация по квантильному скетчу: один "троллинговый" лот не задаёт цену
+		recommended_price, anchor_price, sketch_notes = self._recommend_price(
+			PriceSketches.key(221, config.market_server, donate_name), prices, minimum=50  # Аккаунт не дешевле 50 руб
+		)
+		
+		print(f"[FunPay] Рекомендуемая цена: {recommended_price}")
+		
+		# Форматируем цены для понятности
+		def format_price(price):
+			if price < 100:
+				return f"{price:.0f} руб"
+			else:
+				rubles = int(price)
+				kopecks = int((price - rubles) * 100)
+				if kopecks == 0:
+					return f"{rubles} руб"
+				else:
+					return f"{rubles} руб {kopecks} коп"
+		
+		donate_title = search_donate if search_donate else "все донаты"
+		result = f"""🔍 **FunTime аккаунты анализ - {donate_title}**
+
+📊 **Цены на аккаунты:**
+• Минимальная: {format_price(min_price)}
+• Максимальная: {format_price(max_price)}
+• Средняя: {format_price(avg_price)}
+• Всего предложений: {len(prices)}
+
+{chr(10).join(sketch_notes)}
+
+💡 **Рекомендация: {format_price(recommended_price)}** за аккаунт
+⬇️ На {((anchor_price - recommended_price) / anchor_price * 100):.0f}% ниже самой дешёвой правдоподобной ({format_price(anchor_price)})
+
+🎯 **Анализировался донат:** {donate_title}"""
+		if age is not None:
+			result += f"\n🕒 Данные обхода рынка: {age:.0f} сек назад"
+		
+		print(f"[FunPay] Результат: {result[:100]}...")
+		
+		return result
 
 	async def analyze_currency_prices(self) -> str:
 		"""Анализ цен на валюту Minecraft для сервера FunTime"""
 		try:
+			# Свежий снимок фонового обхода — отвечаем без парсинга
+			snapshot = self.fresh_snapshot(1596)
+			if snapshot:
+				prices = [l["price"] for l in snapshot["lots"] if self._on_market_server(l) and 0.001 <= l["price"] <= 100]
+				if prices:
+					return self._currency_report(prices, age=time.time() - snapshot["ts"])
+			
 			# Используем основную страницу или создаем новую
 			page = self._page
 			if not page or page.is_closed():
@@ -1797,6 +2791,7 @@ class FunPayClient:
 			
 			# Ждем загрузки результатов
 			await asyncio.sleep(3)
+			await self._record_market_snapshot(1596, await page.content())
 			
 			# Ищем цены на странице
 			print("[FunPay] Анализируем цены...")
@@ -1888,55 +2883,7 @@ class FunPayClient:
 			if not prices:
 				return "❌ Цены не найдены. Попробуйте позже."
 			
-			# Анализируем цены
-			prices.sort()
-			min_price = prices[0]
-			max_price = prices[-1]
-			avg_price = sum(prices) / len(prices)
-			
-			# Находим медиану
-			n = len(prices)
-			if n % 2 == 0:
-				median = (prices[n//2-1] + prices[n//2]) / 2
-			else:
-				median = prices[n//2]
-			
-			# Умная рекомендация цены
-			if min_price < 0.1:  # Если минимальная цена меньше 10 копеек
-				# Рекомендуем цену на 1-2 копейки ниже минимальной
-				recommended_price = max(min_price - 0.01, 0.01)
-			elif min_price < 1:  # Если минимальная цена меньше 1 рубля
-				# Рекомендуем цену на 5-10% ниже
-				recommended_price = max(min_price * 0.9, 0.01)
-			else:  # Если минимальная цена больше 1 рубля
-				# Рекомендуем цену на 10-15% ниже
-				recommended_price = min_price * 0.85
-			
-			# Форматируем цены для понятности
-			def format_price(price):
-				if price < 1:
-					kopecks = int(price * 100)
-					return f"{kopecks} копеек"
-				else:
-					rubles = int(price)
-					kopecks = int((price - rubles) * 100)
-					if kopecks == 0:
-						return f"{rubles} рублей"
-					else:
-						return f"{rubles} руб {kopecks} коп"
-			
-			result = f"""🔍 **FunTime анализ**
-
-📊 **Цены за 1кк валюты:**
-• Минимальная: {format_price(min_price)}
-• Максимальная: {format_price(max_price)}
-• Средняя: {format_price(avg_price)}
-• Всего предложений: {len(prices)}
-
-💡 **Рекомендация: {format_price(recommended_price)}** за 1кк
-⬇️ На {((min_price - recommended_price) / min_price * 100):.0f}% ниже минимальной!"""
-			
-			return result
+			return self._currency_report(prices)
 			
 		except Exception as e:
 			print(f"[FunPay] Ошибка анализа цен: {e}")
@@ -1945,6 +2892,16 @@ class FunPayClient:
 	async def analyze_account_prices(self, donate_name: str = None) -> str:
 		"""Анализ цен на аккаунты Minecraft для сервера FunTime"""
 		try:
+			# Свежий снимок фонового обхода — отвечаем без парсинга
+			snapshot = self.fresh_snapshot(221)
+			if snapshot:
+				prices = [
+					l["price"] for l in snapshot["lots"]
+					if self._on_market_server(l) and (not donate_name or l.get("tier") == donate_name) and 10 <= l["price"] <= 10000
+				]
+				if prices:
+					return self._account_report(prices, donate_name, age=time.time() - snapshot["ts"])
+			
 			# Используем основную страницу или создаем новую
 			page = self._page
 			if not page or page.is_closed():
@@ -2003,6 +2960,7 @@ class FunPayClient:
 			
 			# Ждем загрузки результатов
 			await asyncio.sleep(3)
+			await self._record_market_snapshot(221, await page.content())
 			
 			# Определяем название доната для поиска
 			donate_display = {
@@ -2172,56 +3130,7 @@ class FunPayClient:
 			if len(prices) > 0:
 				print(f"[FunPay] Диапазон цен: {min(prices)} - {max(prices)}")
 			
-			# Сортируем цены для анализа
-			prices.sort()
-			min_price = prices[0]
-			max_price = prices[-1]
-			avg_price = sum(prices) / len(prices)
-			
-			print(f"[FunPay] После сортировки: мин={min_price}, макс={max_price}, средняя={avg_price:.2f}")
-			
-			# Умная рекомендация цены
-			if min_price < 100:  # Если минимальная цена меньше 100 рублей
-				# Рекомендуем цену на 10-20 рублей ниже минимальной
-				recommended_price = max(min_price - 15, 50)
-			elif min_price < 500:  # Если минимальная цена меньше 500 рублей
-				# Рекомендуем цену на 5-10% ниже
-				recommended_price = min_price * 0.9
-			else:  # Если минимальная цена больше 500 рублей
-				# Рекомендуем цену на 10-15% ниже
-				recommended_price = min_price * 0.85
-			
-			print(f"[FunPay] Рекомендуемая цена: {recommended_price}")
-			
-			# Форматируем цены для понятности
-			def format_price(price):
-				if price < 100:
-					return f"{price:.0f} руб"
-				else:
-					rubles = int(price)
-					kopecks = int((price - rubles) * 100)
-					if kopecks == 0:
-						return f"{rubles} руб"
-					else:
-						return f"{rubles} руб {kopecks} коп"
-			
-			donate_title = search_donate if search_donate else "все донаты"
-			result = f"""🔍 **FunTime аккаунты анализ - {donate_title}**
-
-📊 **Цены на аккаунты:**
-• Минимальная: {format_price(min_price)}
-• Максимальная: {format_price(max_price)}
-• Средняя: {format_price(avg_price)}
-• Всего предложений: {len(prices)}
-
-💡 **Рекомендация: {format_price(recommended_price)}** за аккаунт
-⬇️ На {((min_price - recommended_price) / min_price * 100):.0f}% ниже минимальной!
-
-🎯 **Анализировался донат:** {donate_title}"""
-			
-			print(f"[FunPay] Результат: {result[:100]}...")
-			
-			return result
+			return self._account_report(prices, donate_name)
 			
 		except Exception as e:
 			print(f"[FunPay] Ошибка анализа цен аккаунтов: {e}")
@@ -2229,39 +3138,21 @@ class FunPayClient:
 			traceback.print_exc()
 			return f"❌ Ошибка: {str(e)[:50]}..."
 
+	async def account_index(self) -> LotIndex:
+		"""Обновляет индекс лотов аккаунтов, если он устарел: один парсинг списка на обход"""
+		async with self._account_index_lock:
+			# Пока ждали блокировку, индекс мог обновить другой вызов
+			if self._account_index.age < config.lot_index_ttl_sec:
+				return self._account_index
+			await self.rate_budget.acquire()
+			html = await self.fetch_html("lots/221/")
+			if html:
+				await self._record_market_snapshot(221, html)
+		return self._account_index
+
 	async def find_cheapest_account(self, donate_name: str) -> str:
 		"""Поиск самого дешевого аккаунта с донатом"""
 		try:
-			# Используем основную страницу или создаем новую
-			page = self._page
-			if not page or page.is_closed():
-				page = await self._ensure_orders_page()
-			
-			# Переходим на страницу покупки аккаунтов (не продаж!)
-			await page.goto("https://funpay.com/lots/221/?type=buy", wait_until="domcontentloaded")
-			await asyncio.sleep(2)
-			
-			# Выбираем сервер FunTime
-			try:
-				await page.evaluate("""
-					() => {
-						const serverSelect = document.querySelector('select[name="server"]');
-						if (serverSelect) {
-							const funtimeOption = Array.from(serverSelect.options).find(option => 
-								option.textContent.toLowerCase().includes('funtime') || 
-								option.textContent.toLowerCase().includes('fun time')
-							);
-							if (funtimeOption) {
-								funtimeOption.selected = true;
-								serverSelect.dispatchEvent(new Event('change'));
-							}
-						}
-					}
-				""")
-				await asyncio.sleep(2)
-			except Exception as e:
-				print(f"[FunPay] Ошибка выбора сервера: {e}")
-			
 			# Определяем название доната для поиска
 			donate_display = {
 				"герцог": "Герцог навсегда",
@@ -2275,81 +3166,21 @@ class FunPayClient:
 			search_donate = donate_display.get(donate_name, donate_name)
 			print(f"[FunPay] Ищем самый дешевый аккаунт с донатом: {search_donate}")
 			
-			# Ищем все аккаунты с этим донатом
-			accounts = await page.evaluate(f"""
-				() => {{
-					const accounts = [];
-					const searchDonate = '{search_donate}';
-					
-					// Ищем все карточки товаров
-					const productCards = document.querySelectorAll('tr, .lot-item, .product-item, [class*="lot"], [class*="item"], [class*="product"], .row .col, .card, .lot');
-					
-					for (let card of productCards) {{
-						const text = card.textContent || '';
-						
-						// Проверяем наличие доната в описании
-						if (text.toLowerCase().includes(searchDonate.toLowerCase())) {{
-							// Ищем цену
-							const priceRegex = /(\\d+\\.?\\d*)\\s*₽/g;
-							let match;
-							let price = null;
-							while ((match = priceRegex.exec(text)) !== null) {{
-								const p = parseFloat(match[1]);
-								if (p >= 10 && p <= 10000) {{
-									price = p;
-									break;
-								}}
-							}}
-							
-							// Ищем ссылку на лот
-							const linkElement = card.querySelector('a[href*="/lot/"]');
-							let link = null;
-							if (linkElement) {{
-								link = linkElement.href;
-							}} else {{
-								// Ищем ссылку в родительских элементах
-								let parent = card.parentElement;
-								while (parent && !link) {{
-									const parentLink = parent.querySelector('a[href*="/lot/"]');
-									if (parentLink) {{
-										link = parentLink.href;
-										break;
-									}}
-									parent = parent.parentElement;
-								}}
-							}}
-							
-							if (price && link) {{
-								accounts.push({{
-									price: price,
-									link: link,
-									description: text.substring(0, 200)
-								}});
-							}}
-						}}
-					}}
-					
-					// Сортируем по цене
-					accounts.sort((a, b) => a.price - b.price);
-					
-					return accounts;
-				}}
-			""")
-			
-			if not accounts:
+			index = await self.account_index()
+			cheapest = index.cheapest(donate_name)
+			if not cheapest:
 				return f"❌ Не найдено аккаунтов с донатом '{search_donate}'"
 			
-			# Берем самый дешевый
-			cheapest = accounts[0]
-			
+			min_price, max_price, total = index.price_range(donate_name)
 			result = f"""🛒 **Самый дешевый аккаунт с донатом {search_donate}**
 
 💰 **Цена:** {cheapest['price']:.0f} руб
 🔗 **Ссылка:** {cheapest['link']}
 📝 **Описание:** {cheapest['description'][:100]}...
 
-💡 **Всего найдено:** {len(accounts)} аккаунтов
-📊 **Диапазон цен:** {min(acc['price'] for acc in accounts):.0f} - {max(acc['price'] for acc in accounts):.0f} руб"""
+💡 **Всего найдено:** {total} аккаунтов
+📊 **Диапазон цен:** {min_price:.0f} - {max_price:.0f} руб
+🕒 **Данные обхода:** {index.age:.0f} сек назад"""
 			
 			return result
 			
@@ -2404,36 +3235,6 @@ class FunPayClient:
 	async def find_cheapest_account_with_binding(self, donate_name: str, binding_type: str) -> str:
 		"""Поиск самого дешевого аккаунта с донатом и типом привязки"""
 		try:
-			# Используем основную страницу или создаем новую
-			page = self._page
-			if not page or page.is_closed():
-				page = await self._ensure_orders_page()
-			
-			# Переходим на страницу покупки аккаунтов (не продаж!)
-			await page.goto("https://funpay.com/lots/221/?type=buy", wait_until="domcontentloaded")
-			await asyncio.sleep(2)
-			
-			# Выбираем сервер FunTime
-			try:
-				await page.evaluate("""
-					() => {
-						const serverSelect = document.querySelector('select[name="server"]');
-						if (serverSelect) {
-							const funtimeOption = Array.from(serverSelect.options).find(option => 
-								option.textContent.toLowerCase().includes('funtime') || 
-								option.textContent.toLowerCase().includes('fun time')
-							);
-							if (funtimeOption) {
-								funtimeOption.selected = true;
-								serverSelect.dispatchEvent(new Event('change'));
-							}
-						}
-					}
-				""")
-				await asyncio.sleep(2)
-			except Exception as e:
-				print(f"[FunPay] Ошибка выбора сервера: {e}")
-			
 			# Определяем название доната для поиска
 			donate_display = {
 				"герцог": "Герцог навсегда",
@@ -2443,284 +3244,41 @@ class FunPayClient:
 				"элита": "Элита",
 				"принц": "Принц"
 			}
+			binding_names = {
+				"with": "с привязкой",
+				"without": "без привязки", 
+				"lost": "с утерянной привязкой",
+				"any": "любого типа"
+			}
 			
 			search_donate = donate_display.get(donate_name, donate_name)
+			binding_name = binding_names.get(binding_type, binding_type)
 			print(f"[FunPay] Ищем аккаунт с донатом: {search_donate}, тип привязки: {binding_type}")
 			
-			# Ищем поле поиска и вводим текст
-			try:
-				search_input = await page.wait_for_selector('input[type="text"], input[placeholder*="поиск"], input[placeholder*="search"]', timeout=5000)
-				if search_input:
-					await search_input.fill(f"*{search_donate}*")
-					await search_input.press("Enter")
-					await asyncio.sleep(3)
-					print(f"[FunPay] Выполнен поиск по: *{search_donate}*")
-				else:
-					print("[FunPay] Поле поиска не найдено")
-			except Exception as e:
-				print(f"[FunPay] Ошибка поиска: {e}")
-			
-			# Убеждаемся, что мы на странице покупки, а не продажи
-			try:
-				await page.evaluate("""
-					() => {
-						// Ищем кнопку "Купить" или переключатель "Покупка"
-						const buyButton = document.querySelector('button:has-text("Купить"), a:has-text("Купить")');
-						if (buyButton) {
-							buyButton.click();
-						}
-						
-						// Ищем переключатель "Покупка" vs "Продажа"
-						const buyTab = document.querySelector('a:has-text("Покупка"), button:has-text("Покупка")');
-						if (buyTab) {
-							buyTab.click();
-						}
-					}
-				""")
-				await asyncio.sleep(2)
-				print("[FunPay] Переключились на режим покупки")
-				
-				# Делаем скриншот для отладки
-				await page.screenshot(path="debug_buy_mode.png")
-				print("[FunPay] Скриншот режима покупки: debug_buy_mode.png")
-			except Exception as e:
-				print(f"[FunPay] Ошибка переключения на покупку: {e}")
-			
-			# Ищем все аккаунты с этим донатом и типом привязки
-			accounts = await page.evaluate(f"""
-				() => {{
-					const accounts = [];
-					const searchDonate = '{search_donate}';
-					const bindingType = '{binding_type}';
-					
-					console.log('Ищем донат:', searchDonate);
-					console.log('Тип привязки:', bindingType);
-					console.log('Текущий URL:', window.location.href);
-					
-					// Ищем все карточки товаров для покупки (не для продажи!)
-					const productCards = document.querySelectorAll('tr, .lot-item, .product-item, [class*="lot"], [class*="item"], [class*="product"], .row .col, .card, .lot');
-					console.log('Найдено карточек:', productCards.length);
-					
-					// Фильтруем только карточки для покупки (исключаем продажи)
-					const buyCards = [];
-					for (let card of productCards) {
-						const text = card.textContent || '';
-						// Исключаем карточки с текстом "Продажа" или "Продаю"
-						if (!text.toLowerCase().includes('продажа') && 
-							!text.toLowerCase().includes('продаю') &&
-							!text.toLowerCase().includes('продам')) {
-							buyCards.push(card);
-						}
-					}
-					console.log('Отфильтровано карточек для покупки:', buyCards.length);
-					
-					// Показываем первые несколько карточек для отладки
-					for (let i = 0; i < Math.min(3, buyCards.length); i++) {{
-						console.log('Карточка', i+1, ':', buyCards[i].textContent.substring(0, 100));
-					}}
-					
-					for (let card of buyCards) {{
-						const text = card.textContent || '';
-						
-						// Проверяем наличие доната в описании (ищем точное совпадение)
-						const hasDonate = text.toLowerCase().includes(searchDonate.toLowerCase());
-						
-						// Если не нашли точное совпадение, ищем частичные совпадения
-						let hasPartialDonate = false;
-						if (!hasDonate) {{
-							// Ищем частичные совпадения для разных донатов
-							if (searchDonate.includes('Князь')) {{
-								hasPartialDonate = text.toLowerCase().includes('князь') && text.toLowerCase().includes('навсегда');
-							}} else if (searchDonate.includes('Герцог')) {{
-								hasPartialDonate = text.toLowerCase().includes('герцог') && text.toLowerCase().includes('навсегда');
-							}} else if (searchDonate.includes('Глава')) {{
-								hasPartialDonate = text.toLowerCase().includes('глава');
-							}} else if (searchDonate.includes('Титан')) {{
-								hasPartialDonate = text.toLowerCase().includes('титан');
-							}} else if (searchDonate.includes('Элита')) {{
-								hasPartialDonate = text.toLowerCase().includes('элита');
-							}} else if (searchDonate.includes('Принц')) {{
-								hasPartialDonate = text.toLowerCase().includes('принц');
-							}}
-						}}
-						
-						if (hasDonate || hasPartialDonate) {{
-							// Проверяем тип привязки
-							let matchesBinding = false;
-							if (bindingType === 'any') {{
-								matchesBinding = true;
-							}} else if (bindingType === 'with') {{
-								// С привязкой - ищем слова "привязка", "привязан", "привязан к"
-								matchesBinding = text.toLowerCase().includes('привязка') || 
-												text.toLowerCase().includes('привязан') ||
-												text.toLowerCase().includes('привязан к');
-							}} else if (bindingType === 'without') {{
-								// Без привязки - ищем слова "без привязки", "не привязан"
-								matchesBinding = text.toLowerCase().includes('без привязки') || 
-												text.toLowerCase().includes('не привязан') ||
-												text.toLowerCase().includes('без привязки к');
-							}} else if (bindingType === 'lost') {{
-								// Утерянная привязка - ищем слова "утерянная", "потерянная"
-								matchesBinding = text.toLowerCase().includes('утерянная') || 
-												text.toLowerCase().includes('потерянная') ||
-												text.toLowerCase().includes('утерян');
-							}}
-							
-							if (matchesBinding) {{
-								console.log('Найден подходящий аккаунт:', text.substring(0, 100));
-								
-								// Ищем цену
-								const priceRegex = /(\\d+\\.?\\d*)\\s*₽/g;
-								let match;
-								let price = null;
-								while ((match = priceRegex.exec(text)) !== null) {{
-									const p = parseFloat(match[1]);
-									if (p >= 10 && p <= 10000) {{
-										price = p;
-										break;
-									}}
-								}}
-								
-								// Ищем ссылку на лот
-								const linkElement = card.querySelector('a[href*="/lot/"]');
-								let link = null;
-								if (linkElement) {{
-									link = linkElement.href;
-								}} else {{
-									// Ищем ссылку в родительских элементах
-									let parent = card.parentElement;
-									while (parent && !link) {{
-										const parentLink = parent.querySelector('a[href*="/lot/"]');
-										if (parentLink) {{
-											link = parentLink.href;
-											break;
-										}}
-										parent = parent.parentElement;
-									}}
-								}}
-								
-								if (price && link) {{
-									console.log('Добавляем аккаунт:', price, link);
-									accounts.push({{
-										price: price,
-										link: link,
-										description: text.substring(0, 200)
-									}});
-								}} else {{
-									console.log('Не найдена цена или ссылка:', price, link);
-								}}
-							}}
-						}}
-					}}
-					
-					// Сортируем по цене
-					accounts.sort((a, b) => a.price - b.price);
-					
-					console.log('Итого найдено аккаунтов:', accounts.length);
-					if (accounts.length > 0) {{
-						console.log('Первый аккаунт:', accounts[0]);
-					}}
-					
-					return accounts;
-				}}
-			""")
-			
-			print(f"[FunPay] JavaScript вернул {len(accounts) if accounts else 0} аккаунтов")
-			
-			if accounts:
-				print(f"[FunPay] Найдены аккаунты:")
-				for i, acc in enumerate(accounts[:3]):  # Показываем первые 3
-					print(f"[FunPay] {i+1}. {acc['price']} руб - {acc['description'][:50]}...")
-			else:
-				print(f"[FunPay] Аккаунты не найдены")
-				print(f"[FunPay] Возможные причины:")
-				print(f"[FunPay] 1. Неправильный поиск доната: '{search_donate}'")
-				print(f"[FunPay] 2. Неправильный тип привязки: '{binding_type}'")
-				print(f"[FunPay] 3. Проблемы с селекторами карточек")
-				print(f"[FunPay] 4. Проблемы с извлечением цен/ссылок")
-				
-				# Делаем скриншот для отладки
-				try:
-					await page.screenshot(path="debug_no_accounts_found.png")
-					print("[FunPay] Скриншот сохранен: debug_no_accounts_found.png")
-				except Exception as e:
-					print(f"[FunPay] Ошибка скриншота: {e}")
-			
-			if not accounts:
-				binding_names = {
-					"with": "с привязкой",
-					"without": "без привязки", 
-					"lost": "с утерянной привязкой",
-					"any": "любого типа"
-				}
-				binding_name = binding_names.get(binding_type, binding_type)
-				print(f"[FunPay] Не найдено аккаунтов с донатом '{search_donate}' {binding_name}")
+			# Лоты уже разобраны на (донат, привязка, цена, ссылка) — берём голову списка
+			index = await self.account_index()
+			cheapest = index.cheapest(donate_name, binding_type)
+			if not cheapest:
+				print(f"[FunPay] Не найдено аккаунтов с донатом '{search_donate}' {binding_name} (в индексе {len(index)} лотов)")
 				return f"❌ Не найдено аккаунтов с донатом '{search_donate}' {binding_name}"
 			
-			# Берем самый дешевый
-			cheapest = accounts[0]
+			min_price, max_price, total = index.price_range(donate_name, binding_type)
 			print(f"[FunPay] Самый дешевый аккаунт: {cheapest['price']} руб, {cheapest['link']}")
 			
-			# Анализируем конкретный лот для определения типа привязки
-			if binding_type != "any":
+			binding = cheapest["binding"]
+			if binding == "unknown":
+				# В описании списка привязки нет — смотрим страницу лота
 				print(f"[FunPay] Анализируем лот для определения типа привязки...")
-				lot_analysis = await self._analyze_lot_binding(cheapest['link'])
-				if lot_analysis:
-					print(f"[FunPay] Анализ лота: {lot_analysis}")
-					
-					# Если тип привязки не совпадает, ищем следующий лот
-					if binding_type == "without" and "без привязки" not in lot_analysis.lower():
-						print(f"[FunPay] Лот не подходит по типу привязки, ищем следующий...")
-						# Ищем следующий подходящий лот
-						for i, acc in enumerate(accounts[1:], 1):
-							lot_analysis = await self._analyze_lot_binding(acc['link'])
-							if lot_analysis and "без привязки" in lot_analysis.lower():
-								cheapest = acc
-								print(f"[FunPay] Найден подходящий лот: {acc['price']} руб")
-								break
-					elif binding_type == "with" and "привязка" not in lot_analysis.lower():
-						print(f"[FunPay] Лот не подходит по типу привязки, ищем следующий...")
-						# Ищем следующий подходящий лот
-						for i, acc in enumerate(accounts[1:], 1):
-							lot_analysis = await self._analyze_lot_binding(acc['link'])
-							if lot_analysis and "привязка" in lot_analysis.lower():
-								cheapest = acc
-								print(f"[FunPay] Найден подходящий лот: {acc['price']} руб")
-								break
-			
-			binding_names = {
-				"with": "с привязкой",
-				"without": "без привязки", 
-				"lost": "с утерянной привязкой",
-				"any": "любого типа"
-			}
-			binding_name = binding_names.get(binding_type, binding_type)
-			
-			# Проверяем, определен ли тип привязки
-			binding_info = ""
-			if binding_type != "any":
-				lot_analysis = await self._analyze_lot_binding(cheapest['link'])
-				if lot_analysis:
-					if "без привязки" in lot_analysis.lower():
-						binding_info = "✅ **Тип привязки:** Без привязки"
-					elif "привязка" in lot_analysis.lower():
-						binding_info = "✅ **Тип привязки:** С привязкой"
-					else:
-						binding_info = "❓ **Тип привязки:** Не определен - нужно уточнить у продавца\n💬 **Сообщение продавцу:** Привет! Аккаунт с привязкой?"
-				else:
-					binding_info = "❓ **Тип привязки:** Не определен - нужно уточнить у продавца\n💬 **Сообщение продавцу:** Привет! Аккаунт с привязкой?"
+				binding = detect_binding(await self._analyze_lot_binding(cheapest['link']))
+			
+			if binding == "without":
+				binding_info = "✅ **Тип привязки:** Без привязки"
+			elif binding == "with":
+				binding_info = "✅ **Тип привязки:** С привязкой"
+			elif binding == "lost":
+				binding_info = "✅ **Тип привязки:** Утерянная привязка"
 			else:
-				# Для типа "any" тоже анализируем лот
-				lot_analysis = await self._analyze_lot_binding(cheapest['link'])
-				if lot_analysis:
-					if "без привязки" in lot_analysis.lower():
-						binding_info = "✅ **Тип привязки:** Без привязки"
-					elif "привязка" in lot_analysis.lower():
-						binding_info = "✅ **Тип привязки:** С привязкой"
-					else:
-						binding_info = "❓ **Тип привязки:** Не определен - нужно уточнить у продавца\n💬 **Сообщение продавцу:** Привет! Аккаунт с привязкой?"
-				else:
-					binding_info = "❓ **Тип привязки:** Не определен - нужно уточнить у продавца\n💬 **Сообщение продавцу:** Привет! Аккаунт с привязкой?"
+				binding_info = "❓ **Тип привязки:** Не определен - нужно уточнить у продавца\n💬 **Сообщение продавцу:** Привет! Аккаунт с привязкой?"
 			
 			result = f"""🛒 **Самый дешевый аккаунт {search_donate} {binding_name}**
 
@@ -2730,8 +3288,9 @@ class FunPayClient:
 
 {binding_info}
 
-💡 **Всего найдено:** {len(accounts)} аккаунтов
-📊 **Диапазон цен:** {min(acc['price'] for acc in accounts):.0f} - {max(acc['price'] for acc in accounts):.0f} руб"""
+💡 **Всего найдено:** {total} аккаунтов
+📊 **Диапазон цен:** {min_price:.0f} - {max_price:.0f} руб
+🕒 **Данные обхода:** {index.age:.0f} сек назад"""
 			
 			return result
 			
@@ -2744,7 +3303,7 @@ class FunPayClient:
 	async def _analyze_lot_binding(self, lot_url: str) -> str:
 		"""Анализирует лот для определения типа привязки"""
 		try:
-			page = await self._ensure_orders_page()
+			page = await self._ensure_scrape_page()
 			await page.goto(lot_url, wait_until="domcontentloaded")
 			await asyncio.sleep(2)
 			
@@ -2773,10 +3332,8 @@ class FunPayClient:
 	async def analyze_lot_details(self, lot_url: str) -> str:
 		"""Анализ детальной информации о лоте"""
 		try:
-			# Используем основную страницу или создаем новую
-			page = self._page
-			if not page or page.is_closed():
-				page = await self._ensure_orders_page()
+			# Страница лота серверная — читаем во вкладке без JavaScript
+			page = await self._ensure_scrape_page()
 			
 			# Переходим на страницу лота
 			await page.goto(lot_url, wait_until="domcontentloaded")
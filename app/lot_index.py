@@ -0,0 +1,104 @@
+import re
+import time
+from bisect import insort
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .parsers import detect_tier
+
+
+# Тип привязки по описанию лота. Порядок важен: "без привязки" и "утерянная привязка"
+# тоже содержат слово "привязка", поэтому проверяются раньше.
+BINDING_PATTERNS = [
+	("without", re.compile(r"без\s+привяз|не\s+привязан|отвязан")),
+	("lost", re.compile(r"утерян|потерян")),
+	("with", re.compile(r"привязк|привязан")),
+]
+BINDING_TYPES = ("with", "without", "lost", "unknown")
+
+
+def detect_binding(text: str) -> str:
+	low = (text or "").lower()
+	for binding, pattern in BINDING_PATTERNS:
+		if pattern.search(low):
+			return binding
+	return "unknown"
+
+
+def classify_lot(lot: dict) -> Tuple[Optional[str], str]:
+	"""(донат, тип привязки) для лота — считается один раз при построении индекса"""
+	description = lot.get("description") or ""
+	tier = lot.get("tier") or detect_tier(description)
+	return tier, detect_binding(description)
+
+
+class LotIndex:
+	"""Индекс лотов аккаунтов по (донат, привязка) с отсортированными по цене списками.
+
+	Самый дешёвый лот нужного типа — первый элемент списка, поиск без обхода карточек.
+	"""
+
+	def __init__(self) -> None:
+		self._buckets: Dict[Tuple[str, str], List[tuple]] = {}
+		self._lots: Dict[str, dict] = {}
+		self.updated_at: float = 0.0
+
+	def __len__(self) -> int:
+		return len(self._lots)
+
+	@property
+	def age(self) -> float:
+		return time.time() - self.updated_at if self.updated_at else float("inf")
+
+	def rebuild(self, lots: List[dict], server: Optional[str] = None) -> None:
+		buckets: Dict[Tuple[str, str], List[tuple]] = {}
+		by_id: Dict[str, dict] = {}
+		for lot in lots:
+			if server and lot.get("server") and lot["server"].lower() != server.lower():
+				continue
+			tier, binding = classify_lot(lot)
+			if not tier:
+				continue
+			entry = dict(lot, tier=tier, binding=binding)
+			by_id[lot["lot_id"]] = entry
+			insort(buckets.setdefault((tier, binding), []), (lot["price"], lot["lot_id"]))
+		self._buckets = buckets
+		self._lots = by_id
+		self.updated_at = time.time()
+
+	def matches(self, tier: str, binding: str = "any") -> List[dict]:
+		"""Все лоты доната с нужной привязкой, от дешёвых к дорогим"""
+		bindings = BINDING_TYPES if binding == "any" else (binding,)
+		keys = [k for b in bindings for k in self._buckets.get((tier, b), [])]
+		if binding == "any":
+			keys.sort()
+		return [self._lots[lot_id] for _, lot_id in keys]
+
+	def cheapest(self, tier: str, binding: str = "any") -> Optional[dict]:
+		bindings = BINDING_TYPES if binding == "any" else (binding,)
+		heads = [self._buckets[(tier, b)][0] for b in bindings if self._buckets.get((tier, b))]
+		if not heads:
+			return None
+		return self._lots[min(heads)[1]]
+
+	def cheapest_excluding(self, tier: str, binding: str, exclude_ids: set, accept: Optional[Callable[[float], bool]] = None) -> Optional[dict]:
+		"""Самый дешёвый лот, не входящий в exclude_ids (например, чужой относительно наших лотов).
+
+		accept — дополнительный фильтр по цене (например, отсев выбросов).
+		"""
+		bindings = BINDING_TYPES if binding == "any" else (binding,)
+		best = None
+		for b in bindings:
+			for key in self._buckets.get((tier, b), []):
+				if key[1] not in exclude_ids and (accept is None or accept(key[0])):
+					if best is None or key < best:
+						best = key
+					break
+		return self._lots[best[1]] if best else None
+
+	def price_range(self, tier: str, binding: str = "any") -> Optional[Tuple[float, float, int]]:
+		"""(мин, макс, количество) без сортировки — по краям списков"""
+		bindings = BINDING_TYPES if binding == "any" else (binding,)
+		lists = [self._buckets[(tier, b)] for b in bindings if self._buckets.get((tier, b))]
+		if not lists:
+			return None
+		return min(l[0][0] for l in lists), max(l[-1][0] for l in lists), sum(len(l) for l in lists)
@@ -1,4 +1,5 @@
 import asyncio
+import signal
 from .config import config
 from .funpay_client import FunPayClient
 from .telegram_bot import run_telegram
@@ -6,11 +7,22 @@ from .telegram_bot import run_telegram
 
 async def main() -> None:
 	client = FunPayClient()
-	await client.launch()
+	# SIGTERM (перезапуск сервиса) завершает так же, как Ctrl+C: через client.close()
+	main_task = asyncio.current_task()
+	try:
+		asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+	except (NotImplementedError, AttributeError):
+		pass  # Windows: обработчики сигналов в цикле событий не поддерживаются
+	# Браузер поднимается в фоне: Telegram отвечает сразу, команды ждут готовности
+	launch_task = asyncio.create_task(client.launch_in_background())
 	# Автозапуск не включаем, управляем из Telegram
 	try:
 		await run_telegram(client)
+		if not config.telegram_bot_token:
+			# Без Telegram, как и раньше: дождаться запуска браузера и выйти
+			await launch_task
 	finally:
+		launch_task.cancel()
 		await client.close()
 
 
@@ -0,0 +1,193 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+	category INTEGER NOT NULL,
+	server TEXT NOT NULL,
+	lot_id TEXT NOT NULL,
+	tier TEXT,
+	seller TEXT,
+	description TEXT,
+	link TEXT,
+	price REAL,
+	first_seen REAL NOT NULL,
+	removed_at REAL,
+	PRIMARY KEY (category, server, lot_id)
+);
+CREATE TABLE IF NOT EXISTS lot_events (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	ts REAL NOT NULL,
+	category INTEGER NOT NULL,
+	server TEXT NOT NULL,
+	lot_id TEXT NOT NULL,
+	tier TEXT,
+	seller TEXT,
+	kind TEXT NOT NULL,
+	price REAL,
+	old_price REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_tier ON lot_events (category, tier, ts);
+CREATE INDEX IF NOT EXISTS idx_events_seller ON lot_events (category, seller, ts);
+"""
+
+
+class MarketStore:
+	"""Локальная история рынка FunPay в SQLite.
+
+	Хранит текущее состояние лотов и журнал изменений: новые лоты ('new'),
+	изменения цены ('price') и снятые лоты ('removed'). Неизменившиеся лоты
+	при повторном снимке не пишутся.
+	"""
+
+	def __init__(self, path: str) -> None:
+		self._path = path
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+			self._conn = sqlite3.connect(self._path)
+			self._conn.row_factory = sqlite3.Row
+			self._conn.executescript(_SCHEMA)
+		return self._conn
+
+	def close(self) -> None:
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
+
+	def record_snapshot(self, category: int, lots: Iterable[dict], servers: Optional[Iterable[str]] = None, ts: Optional[float] = None) -> dict:
+		"""Сохраняет снимок списка лотов категории и возвращает разницу с прошлым снимком.
+
+		servers — какие серверы покрывает снимок (для определения снятых лотов);
+		по умолчанию — вся категория.
+		Возвращает { 'new': [...], 'changed': [...], 'removed': [...], 'initial': bool }
+		"""
+		ts = ts or time.time()
+		db = self._db()
+		scope = set(servers) if servers is not None else None
+		current = {}
+		for row in db.execute(
+			"SELECT server, lot_id, price, tier, seller FROM lots WHERE category = ? AND removed_at IS NULL",
+			(category,),
+		):
+			if scope is None or row["server"] in scope:
+				current[(row["server"], row["lot_id"])] = row
+
+		new, changed, removed = [], [], []
+		seen = set()
+		for lot in lots:
+			key = (lot.get("server") or "", lot["lot_id"])
+			if key in seen:
+				continue
+			seen.add(key)
+			prev = current.get(key)
+			if prev is None:
+				new.append(lot)
+			elif prev["price"] != lot["price"]:
+				changed.append(dict(lot, old_price=prev["price"]))
+		for key, row in current.items():
+			if key not in seen:
+				removed.append({"server": key[0], "lot_id": key[1], "price": row["price"], "tier": row["tier"], "seller": row["seller"]})
+
+		with db:
+			db.executemany(
+				"INSERT INTO lots (category, server, lot_id, tier, seller, description, link, price, first_seen, removed_at) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL) "
+				"ON CONFLICT (category, server, lot_id) DO UPDATE SET tier = excluded.tier, seller = excluded.seller, "
+				"description = excluded.description, link = excluded.link, price = excluded.price, "
+				"first_seen = excluded.first_seen, removed_at = NULL",
+				[(category, l.get("server") or "", l["lot_id"], l.get("tier"), l.get("seller"), l.get("description"), l.get("link"), l["price"], ts) for l in new],
+			)
+			db.executemany(
+				"UPDATE lots SET price = ?, tier = ?, description = ? WHERE category = ? AND server = ? AND lot_id = ?",
+				[(l["price"], l.get("tier"), l.get("description"), category, l.get("server") or "", l["lot_id"]) for l in changed],
+			)
+			db.executemany(
+				"UPDATE lots SET removed_at = ? WHERE category = ? AND server = ? AND lot_id = ?",
+				[(ts, category, l["server"], l["lot_id"]) for l in removed],
+			)
+			db.executemany(
+				"INSERT INTO lot_events (ts, category, server, lot_id, tier, seller, kind, price, old_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				[(ts, category, l.get("server") or "", l["lot_id"], l.get("tier"), l.get("seller"), "new", l["price"], None) for l in new]
+				+ [(ts, category, l.get("server") or "", l["lot_id"], l.get("tier"), l.get("seller"), "price", l["price"], l["old_price"]) for l in changed]
+				+ [(ts, category, l["server"], l["lot_id"], l["tier"], l["seller"], "removed", None, l["price"]) for l in removed],
+			)
+		# initial: первый снимок категории — все лоты "новые", это не изменения рынка
+		return {"new": new, "changed": changed, "removed": removed, "initial": not current}
+
+	def active_lots(self, category: int, tier: Optional[str] = None, server: Optional[str] = None) -> List[dict]:
+		sql = "SELECT * FROM lots WHERE category = ? AND removed_at IS NULL"
+		args: list = [category]
+		if tier:
+			sql += " AND tier = ?"
+			args.append(tier)
+		if server:
+			sql += " AND server = ?"
+			args.append(server)
+		return [dict(r) for r in self._db().execute(sql + " ORDER BY price", args)]
+
+	def price_series(self, category: int, tier: Optional[str] = None, server: Optional[str] = None,
+			since: Optional[float] = None, bucket_sec: int = 86400) -> List[dict]:
+		"""Ряд цен выставленных лотов по интервалам: [{ 'ts', 'min', 'avg', 'max', 'count' }]"""
+		sql = (
+			"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, MIN(price) AS min, AVG(price) AS avg, MAX(price) AS max, COUNT(*) AS count "
+			"FROM lot_events WHERE category = ? AND kind IN ('new', 'price')"
+		)
+		args: list = [bucket_sec, bucket_sec, category]
+		if tier:
+			sql += " AND tier = ?"
+			args.append(tier)
+		if server:
+			sql += " AND server = ?"
+			args.append(server)
+		if since:
+			sql += " AND ts >= ?"
+			args.append(since)
+		sql += " GROUP BY bucket ORDER BY bucket"
+		return [
+			{"ts": r["bucket"], "min": r["min"], "avg": r["avg"], "max": r["max"], "count": r["count"]}
+			for r in self._db().execute(sql, args)
+		]
+
+	def time_on_market(self, category: int, tier: Optional[str] = None, since: Optional[float] = None) -> dict:
+		"""Сколько лоты висят до снятия/продажи: { 'count', 'avg_hours', 'median_hours' }"""
+		sql = "SELECT removed_at - first_seen AS dur FROM lots WHERE category = ? AND removed_at IS NOT NULL"
+		args: list = [category]
+		if tier:
+			sql += " AND tier = ?"
+			args.append(tier)
+		if since:
+			sql += " AND removed_at >= ?"
+			args.append(since)
+		durations = sorted(r["dur"] / 3600 for r in self._db().execute(sql, args))
+		if not durations:
+			return {"count": 0, "avg_hours": None, "median_hours": None}
+		n = len(durations)
+		median = durations[n // 2] if n % 2 else (durations[n // 2 - 1] + durations[n // 2]) / 2
+		return {"count": n, "avg_hours": sum(durations) / n, "median_hours": median}
+
+	def competitor_activity(self, category: int, tier: Optional[str] = None, since: Optional[float] = None, limit: int = 10) -> List[dict]:
+		"""Активность продавцов: новые лоты, снижения/повышения цен, снятия"""
+		sql = (
+			"SELECT seller, "
+			"SUM(kind = 'new') AS new, "
+			"SUM(kind = 'price' AND price < old_price) AS cuts, "
+			"SUM(kind = 'price' AND price > old_price) AS raises, "
+			"SUM(kind = 'removed') AS removed "
+			"FROM lot_events WHERE category = ? AND seller IS NOT NULL AND seller != ''"
+		)
+		args: list = [category]
+		if tier:
+			sql += " AND tier = ?"
+			args.append(tier)
+		if since:
+			sql += " AND ts >= ?"
+			args.append(since)
+		sql += " GROUP BY seller ORDER BY cuts DESC, new DESC LIMIT ?"
+		args.append(limit)
+		return [dict(r) for r in self._db().execute(sql, args)]
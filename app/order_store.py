@@ -0,0 +1,181 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+	order_id TEXT PRIMARY KEY,
+	ts REAL,
+	date TEXT,
+	description TEXT,
+	buyer TEXT,
+	buyer_id TEXT,
+	status TEXT NOT NULL,
+	amount REAL,
+	updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_totals (
+	dim TEXT NOT NULL,
+	key TEXT NOT NULL,
+	status TEXT NOT NULL,
+	count INTEGER NOT NULL DEFAULT 0,
+	sum REAL NOT NULL DEFAULT 0,
+	PRIMARY KEY (dim, key, status)
+);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, ts);
+CREATE TABLE IF NOT EXISTS sync_meta (
+	key TEXT PRIMARY KEY,
+	value TEXT
+);
+"""
+
+STATUSES = ("paid", "closed", "refund")
+
+
+def normalize_status(text: str) -> str:
+	low = (text or "").lower()
+	if "возврат" in low:
+		return "refund"
+	if "закрыт" in low:
+		return "closed"
+	if "оплачен" in low:
+		return "paid"
+	return "other"
+
+
+class OrderStore:
+	"""Локальная история продаж (orders/trade) в SQLite.
+
+	Итоги по статусу, месяцу и покупателю хранятся в order_totals и
+	обновляются только при появлении нового заказа или смене статуса,
+	поэтому статистика считается без обхода всех заказов.
+	"""
+
+	def __init__(self, path: str) -> None:
+		self._path = path
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+			self._conn = sqlite3.connect(self._path)
+			self._conn.row_factory = sqlite3.Row
+			self._conn.executescript(_SCHEMA)
+		return self._conn
+
+	def close(self) -> None:
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
+
+	def __len__(self) -> int:
+		return self._db().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+	@staticmethod
+	def _dims(ts: Optional[float], buyer: Optional[str]) -> List[tuple]:
+		dims = [("all", "")]
+		if ts:
+			dims.append(("month", time.strftime("%Y-%m", time.localtime(ts))))
+		if buyer:
+			dims.append(("buyer", buyer))
+		return dims
+
+	@staticmethod
+	def _apply(db: sqlite3.Connection, row, sign: int) -> None:
+		for dim, key in OrderStore._dims(row["ts"], row["buyer"]):
+			db.execute(
+				"INSERT INTO order_totals (dim, key, status, count, sum) VALUES (?, ?, ?, ?, ?) "
+				"ON CONFLICT (dim, key, status) DO UPDATE SET count = count + excluded.count, sum = sum + excluded.sum",
+				(dim, key, row["status"], sign, sign * (row["amount"] or 0.0)),
+			)
+
+	def upsert(self, orders: Iterable[dict]) -> int:
+		"""Сохраняет заказы; возвращает число новых или изменившихся"""
+		db = self._db()
+		now = time.time()
+		changed = 0
+		with db:
+			for order in orders:
+				row = {
+					"order_id": order["order_id"],
+					"ts": order.get("ts"),
+					"date": order.get("date") or "",
+					"description": order.get("description") or "",
+					"buyer": order.get("buyer") or "",
+					"buyer_id": order.get("buyer_id"),
+					"status": normalize_status(order.get("status")),
+					"amount": order.get("amount"),
+				}
+				prev = db.execute("SELECT * FROM orders WHERE order_id = ?", (row["order_id"],)).fetchone()
+				if prev is not None:
+					# Дата из первой записи точнее ("Сегодня, 12:00" со временем стареет),
+					# недостающие поля берём из сохранённой записи
+					row["ts"] = prev["ts"] or row["ts"]
+					for field in ("date", "description", "buyer", "buyer_id"):
+						row[field] = row[field] or prev[field]
+					if row["amount"] is None:
+						row["amount"] = prev["amount"]
+					# И наоборот: поле, которого не было в сохранённой записи, — тоже изменение
+					# (от даты и покупателя зависят итоги по месяцу и покупателю)
+					filled = any(not prev[field] and row[field] for field in ("ts", "buyer", "buyer_id"))
+					if prev["status"] == row["status"] and prev["amount"] == row["amount"] and not filled:
+						continue
+					self._apply(db, prev, -1)
+				self._apply(db, row, +1)
+				db.execute(
+					"INSERT OR REPLACE INTO orders (order_id, ts, date, description, buyer, buyer_id, status, amount, updated_at) "
+					"VALUES (:order_id, :ts, :date, :description, :buyer, :buyer_id, :status, :amount, :updated_at)",
+					dict(row, updated_at=now),
+				)
+				changed += 1
+		return changed
+
+	def _meta(self, key: str) -> Optional[str]:
+		row = self._db().execute("SELECT value FROM sync_meta WHERE key = ?", (key,)).fetchone()
+		return row[0] if row else None
+
+	def _set_meta(self, key: str, value: Optional[str]) -> None:
+		db = self._db()
+		with db:
+			if value is None:
+				db.execute("DELETE FROM sync_meta WHERE key = ?", (key,))
+			else:
+				db.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)", (key, value))
+
+	@property
+	def full_sync_done(self) -> bool:
+		"""Вся история хотя бы раз пройдена до конца"""
+		return self._meta("full_sync_done") == "1"
+
+	def mark_full_sync_done(self) -> None:
+		self._set_meta("full_sync_done", "1")
+		self._set_meta("sync_cursor", None)
+
+	@property
+	def sync_cursor(self) -> Optional[str]:
+		"""Токен страницы, с которой продолжить прерванную полную синхронизацию"""
+		return self._meta("sync_cursor")
+
+	def set_sync_cursor(self, token: Optional[str]) -> None:
+		self._set_meta("sync_cursor", token)
+
+	def paid_order_ids(self) -> set:
+		return {r[0] for r in self._db().execute("SELECT order_id FROM orders WHERE status = 'paid'")}
+
+	def totals(self, dim: str = "all", key: str = "") -> Dict[str, dict]:
+		"""{ статус: { 'count', 'sum' } } для одного среза итогов"""
+		return {
+			r["status"]: {"count": r["count"], "sum": round(r["sum"], 2)}
+			for r in self._db().execute("SELECT status, count, sum FROM order_totals WHERE dim = ? AND key = ?", (dim, key))
+		}
+
+	def top_buyers(self, limit: int = 5, status: str = "closed") -> List[dict]:
+		return [
+			{"buyer": r["key"], "count": r["count"], "sum": round(r["sum"], 2)}
+			for r in self._db().execute(
+				"SELECT key, count, sum FROM order_totals WHERE dim = 'buyer' AND status = ? AND count > 0 ORDER BY sum DESC LIMIT ?",
+				(status, limit),
+			)
+		]
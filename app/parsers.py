@@ -0,0 +1,277 @@
+import json
+import re
+import time
+from datetime import datetime, timedelta
+from html import unescape
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+
+# Теги без закрывающей пары — не участвуют в подсчёте вложенности
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_BREAK_TAGS = {"br", "div", "p", "li"}
+
+# Поля строки списка лотов FunPay (a.tc-item)
+LOT_FIELDS = {
+	"tc-server": "server",
+	"tc-desc-text": "description",
+	"media-user-name": "seller",
+	"tc-amount": "amount",
+	"tc-price": "price",
+}
+
+# Поля строки списка заказов orders/trade (a.tc-item)
+ORDER_FIELDS = {
+	"tc-date-time": "date",
+	"tc-order": "order",
+	"order-desc": "description",
+	"media-user-name": "buyer",
+	"tc-status": "status",
+	"tc-price": "amount",
+}
+
+_LOT_ID_RE = re.compile(r"(?:[?&]id=|/lot/)(\d+)")
+_OFFER_ID_RE = re.compile(r"[?&]offer=(\d+)")
+_ORDER_ID_RE = re.compile(r"#?([A-Z0-9]{6,})")
+_USER_ID_RE = re.compile(r"/users/(\d+)")
+_APP_DATA_RE = re.compile(r"data-app-data=(?:\"([^\"]*)\"|'([^']*)')")
+_CONTINUE_RE = re.compile(r"<input[^>]*name=\"continue\"[^>]*>")
+_VALUE_RE = re.compile(r"value=\"([^\"]*)\"")
+_ORDER_DATE_RE = re.compile(r"(сегодня|вчера|(\d{1,2})\s+([а-я]+)(?:\s+(\d{4}))?)\s*,?\s*(\d{1,2}):(\d{2})")
+_MONTHS = {
+	"января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+	"июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+_PRICE_RE = re.compile(r"(\d[\d\s]*(?:[.,]\d+)?)")
+
+# Донаты FunTime в порядке убывания ранга: если в описании несколько — берём старший
+TIER_PATTERNS = [
+	("герцог", re.compile(r"герцог"), True),
+	("князь", re.compile(r"князь|князя"), True),
+	("глава", re.compile(r"глава|главу"), False),
+	("титан", re.compile(r"титан"), False),
+	("элита", re.compile(r"элита|элиту"), False),
+	("принц", re.compile(r"принц"), False),
+]
+_FOREVER_RE = re.compile(r"навсегда")
+
+
+class _TcItemParser(HTMLParser):
+	"""Собирает строки таблиц FunPay (.tc-item) и текст их полей по CSS-классам"""
+
+	def __init__(self, fields: Dict[str, str], root: str = "tc-item") -> None:
+		super().__init__(convert_charrefs=True)
+		self._fields = fields
+		self._root = root
+		self.items: List[dict] = []
+		self._item: Optional[dict] = None
+		self._depth = 0
+		self._open: List[tuple] = []  # (имя поля, глубина открытия)
+
+	def handle_starttag(self, tag, attrs) -> None:
+		attrs = dict(attrs)
+		classes = (attrs.get("class") or "").split()
+		if self._item is None:
+			if self._root in classes:
+				self._item = {"href": attrs.get("href") or "", "attrs": attrs, "user_href": None}
+				self._depth = 1
+				self._open = []
+			return
+		if tag in _BREAK_TAGS:
+			# Блочные теги и переносы разделяют текст поля пробелом
+			for name, _ in self._open:
+				self._item[name] += " "
+		if tag in _VOID_TAGS:
+			return
+		self._depth += 1
+		for cls in classes:
+			name = self._fields.get(cls)
+			if name:
+				self._open.append((name, self._depth))
+				self._item.setdefault(name, "")
+				if attrs.get("data-s") is not None:
+					self._item[name + "_data"] = attrs["data-s"]
+		user_href = attrs.get("data-href") or attrs.get("href") or ""
+		if self._item["user_href"] is None and "/users/" in user_href:
+			self._item["user_href"] = user_href
+
+	def handle_endtag(self, tag) -> None:
+		if self._item is None or tag in _VOID_TAGS:
+			return
+		while self._open and self._open[-1][1] >= self._depth:
+			self._open.pop()
+		self._depth -= 1
+		if self._depth <= 0:
+			self.items.append(self._item)
+			self._item = None
+
+	def handle_data(self, data) -> None:
+		if self._item is None:
+			return
+		for name, _ in self._open:
+			self._item[name] += data
+
+
+def clean_text(s: Optional[str]) -> str:
+	return re.sub(r"\s+", " ", s or "").strip()
+
+
+def parse_price(text: Optional[str]) -> Optional[float]:
+	"""Извлекает число из строки цены ('1 234.50 ₽' -> 1234.5)"""
+	if not text:
+		return None
+	m = _PRICE_RE.search(text)
+	if not m:
+		return None
+	try:
+		return float(m.group(1).replace(" ", "").replace("\xa0", "").replace(",", "."))
+	except ValueError:
+		return None
+
+
+def parse_tc_items(html: str, fields: Dict[str, str], root: str = "tc-item") -> List[dict]:
+	parser = _TcItemParser(fields, root)
+	parser.feed(html)
+	parser.close()
+	return parser.items
+
+
+def detect_tier(text: str) -> Optional[str]:
+	"""Определяет донат FunTime по описанию лота (ключ как в donate_display)"""
+	low = (text or "").lower()
+	for tier, pattern, needs_forever in TIER_PATTERNS:
+		if pattern.search(low) and (not needs_forever or _FOREVER_RE.search(low)):
+			return tier
+	return None
+
+
+def parse_lot_listing(html: str) -> List[dict]:
+	"""Парсит страницу lots/<категория>/ в список лотов.
+
+	Элемент: { 'lot_id', 'link', 'server', 'description', 'seller', 'price', 'tier' }
+	"""
+	lots = []
+	for it in parse_tc_items(html, LOT_FIELDS):
+		link = it["href"]
+		m = _LOT_ID_RE.search(link)
+		if not m:
+			continue
+		price = parse_price(it.get("price_data")) or parse_price(it.get("price"))
+		if price is None:
+			continue
+		description = clean_text(it.get("description"))
+		lots.append({
+			"lot_id": m.group(1),
+			"link": link,
+			"server": clean_text(it.get("server")) or clean_text(it["attrs"].get("data-server")),
+			"description": description,
+			"seller": clean_text(it.get("seller")),
+			"price": price,
+			"tier": detect_tier(description),
+		})
+	return lots
+
+
+def parse_own_offers(html: str) -> List[dict]:
+	"""Парсит страницу своих лотов lots/<категория>/trade.
+
+	Элемент: { 'offer_id', 'edit_link', 'server', 'description', 'price', 'tier' }
+	"""
+	offers = []
+	for it in parse_tc_items(html, LOT_FIELDS):
+		link = it["href"]
+		m = _OFFER_ID_RE.search(link) or _LOT_ID_RE.search(link)
+		price = parse_price(it.get("price_data")) or parse_price(it.get("price"))
+		if not m or price is None:
+			continue
+		description = clean_text(it.get("description"))
+		offers.append({
+			"offer_id": m.group(1),
+			"edit_link": link,
+			"server": clean_text(it.get("server")),
+			"description": description,
+			"price": price,
+			"tier": detect_tier(description),
+		})
+	return offers
+
+
+def parse_orders(html: str) -> List[dict]:
+	"""Парсит страницу заказов orders/trade.
+
+	Элемент: { 'order_id', 'link', 'date', 'description', 'buyer', 'buyer_id', 'status', 'amount' }
+	"""
+	orders = []
+	for it in parse_tc_items(html, ORDER_FIELDS):
+		m = _ORDER_ID_RE.search(clean_text(it.get("order"))) or _ORDER_ID_RE.search(it["href"])
+		if not m:
+			continue
+		m_user = _USER_ID_RE.search(it.get("user_href") or "")
+		orders.append({
+			"order_id": "#" + m.group(1),
+			"link": it["href"],
+			"date": clean_text(it.get("date")),
+			"description": clean_text(it.get("description")),
+			"buyer": clean_text(it.get("buyer")),
+			"buyer_id": m_user.group(1) if m_user else None,
+			"status": clean_text(it.get("status")),
+			"amount": parse_price(it.get("amount")),
+			"ts": parse_order_date(it.get("date")),
+		})
+	return orders
+
+
+def parse_order_date(text: Optional[str], now: Optional[float] = None) -> Optional[float]:
+	"""'Сегодня, 12:05' / '3 октября, 14:22' / '28 декабря 2024, 09:00' -> timestamp"""
+	m = _ORDER_DATE_RE.search((text or "").lower())
+	if not m:
+		return None
+	today = datetime.fromtimestamp(now or time.time())
+	hour, minute = int(m.group(5)), int(m.group(6))
+	try:
+		if m.group(1) == "сегодня":
+			day = today
+		elif m.group(1) == "вчера":
+			day = today - timedelta(days=1)
+		else:
+			month = _MONTHS.get(m.group(3))
+			if not month:
+				return None
+			day = datetime(int(m.group(4) or today.year), month, int(m.group(2)))
+			# Без года — текущий год, если дата не в будущем
+			if not m.group(4) and day > today:
+				day = day.replace(year=today.year - 1)
+		return day.replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+	except ValueError:
+		return None
+
+
+def parse_continue_token(html: str) -> Optional[str]:
+	"""Токен следующей страницы таблицы (input name="continue"), None — страниц больше нет"""
+	m = _CONTINUE_RE.search(html or "")
+	if not m:
+		return None
+	value = _VALUE_RE.search(m.group(0))
+	return unescape(value.group(1)) if value and value.group(1) else None
+
+
+def is_paid_status(status: str) -> bool:
+	"""'Оплачен', но не закрытый и не возвращённый заказ"""
+	low = (status or "").lower()
+	return "оплачен" in low and "закрыт" not in low and "возврат" not in low
+
+
+def parse_app_data(html: str) -> dict:
+	"""JSON из атрибута data-app-data у <body>: userId, csrf-token и т.п."""
+	m = _APP_DATA_RE.search(html or "")
+	if not m:
+		return {}
+	try:
+		return json.loads(unescape(m.group(1) or m.group(2)))
+	except ValueError:
+		return {}
+
+
+def parse_chat_messages(html: str) -> List[str]:
+	"""Тексты сообщений открытого диалога (.chat-msg-item → .chat-msg-text), по порядку"""
+	return [clean_text(it.get("text")) for it in parse_tc_items(html, {"chat-msg-text": "text"}, root="chat-msg-item")]
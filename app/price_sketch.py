@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from .atomic_io import dump_json
+
+
+class TDigest:
+	"""Потоковый квантильный скетч (merging t-digest) с постоянной памятью.
+
+	Хранит не больше ~compression центроидов независимо от числа наблюдений.
+	Старые наблюдения плавно теряют вес (half_life_sec), чтобы скетч следил за рынком.
+	"""
+
+	def __init__(self, compression: int = 100, half_life_sec: float = 7 * 86400) -> None:
+		self.compression = compression
+		self.half_life_sec = half_life_sec
+		self._centroids: List[List[float]] = []  # [mean, weight], отсортированы по mean
+		self._buffer: List[float] = []
+		self._updated_at: float = time.time()
+
+	@property
+	def count(self) -> float:
+		return sum(w for _, w in self._centroids) + len(self._buffer)
+
+	def _decay(self, now: float) -> None:
+		if self.half_life_sec <= 0 or not self._centroids:
+			self._updated_at = now
+			return
+		factor = 0.5 ** (max(0.0, now - self._updated_at) / self.half_life_sec)
+		if factor < 1.0:
+			for c in self._centroids:
+				c[1] *= factor
+		self._updated_at = now
+
+	def _k(self, q: float) -> float:
+		return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+	def _compress(self) -> None:
+		if not self._buffer:
+			return
+		points = self._centroids + [[x, 1.0] for x in self._buffer]
+		self._buffer = []
+		points.sort(key=lambda c: c[0])
+		total = sum(w for _, w in points)
+		merged = [list(points[0])]
+		weight_so_far = 0.0
+		k_left = self._k(0.0)
+		for mean, weight in points[1:]:
+			cur = merged[-1]
+			q_right = (weight_so_far + cur[1] + weight) / total
+			if self._k(q_right) - k_left <= 1.0:
+				cur[0] += (mean - cur[0]) * weight / (cur[1] + weight)
+				cur[1] += weight
+			else:
+				weight_so_far += cur[1]
+				k_left = self._k(weight_so_far / total)
+				merged.append([mean, weight])
+		self._centroids = merged
+
+	def add(self, value: float, now: Optional[float] = None) -> None:
+		self._decay(now or time.time())
+		self._buffer.append(float(value))
+		if len(self._buffer) >= self.compression:
+			self._compress()
+
+	def quantile(self, q: float) -> Optional[float]:
+		self._compress()
+		cs = self._centroids
+		if not cs:
+			return None
+		if len(cs) == 1:
+			return cs[0][0]
+		total = sum(w for _, w in cs)
+		target = min(max(q, 0.0), 1.0) * total
+		# Интерполяция между серединами центроидов
+		cumulative = 0.0
+		prev_mid, prev_mean = None, None
+		for mean, weight in cs:
+			mid = cumulative + weight / 2
+			if target <= mid:
+				if prev_mid is None:
+					return mean
+				return prev_mean + (mean - prev_mean) * (target - prev_mid) / (mid - prev_mid)
+			prev_mid, prev_mean = mid, mean
+			cumulative += weight
+		return cs[-1][0]
+
+	def fences(self, k: float = 1.5) -> Optional[tuple]:
+		"""Границы выбросов по Тьюки в логарифмической шкале (цены мультипликативны)"""
+		q1, q3 = self.quantile(0.25), self.quantile(0.75)
+		if not q1 or not q3 or q1 <= 0:
+			return None
+		spread = (q3 / q1) ** k
+		return q1 / spread, q3 * spread
+
+	def to_dict(self) -> dict:
+		self._compress()
+		return {"c": self._centroids, "t": self._updated_at, "compression": self.compression, "half_life": self.half_life_sec}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> "TDigest":
+		d = cls(compression=int(data.get("compression", 100)), half_life_sec=float(data.get("half_life", 7 * 86400)))
+		d._centroids = [[float(m), float(w)] for m, w in data.get("c", [])]
+		d._updated_at = float(data.get("t", time.time()))
+		return d
+
+
+class PriceSketches:
+	"""Набор скетчей цен по ключу (категория:сервер:донат) с сохранением в JSON"""
+
+	# Минимум наблюдений, после которого скетчу доверяем для отсева выбросов
+	MIN_COUNT = 10
+
+	def __init__(self, path: str) -> None:
+		self._path = path
+		self._sketches: Dict[str, TDigest] = {}
+		self._dirty = False
+		self._load()
+
+	@staticmethod
+	def key(category: int, server: Optional[str], tier: Optional[str] = None) -> str:
+		return f"{category}:{server or ''}:{tier or '*'}"
+
+	def _load(self) -> None:
+		try:
+			if os.path.exists(self._path):
+				with open(self._path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+				self._sketches = {k: TDigest.from_dict(v) for k, v in data.items()}
+		except Exception as e:
+			print(f"[Sketch] Ошибка загрузки скетчей цен: {e}")
+
+	def save(self) -> None:
+		if not self._dirty:
+			return
+		try:
+			dump_json(self._path, {k: v.to_dict() for k, v in self._sketches.items()})
+			self._dirty = False
+		except Exception as e:
+			print(f"[Sketch] Ошибка сохранения скетчей цен: {e}")
+
+	def get(self, key: str) -> Optional[TDigest]:
+		return self._sketches.get(key)
+
+	def is_outlier(self, key: str, price: float) -> bool:
+		sketch = self._sketches.get(key)
+		if not sketch or sketch.count < self.MIN_COUNT:
+			return False
+		bounds = sketch.fences()
+		return bool(bounds) and not (bounds[0] <= price <= bounds[1])
+
+	def observe(self, key: str, prices: Iterable[float]) -> int:
+		"""Добавляет наблюдения, отбрасывая выбросы. Возвращает число принятых цен."""
+		sketch = self._sketches.get(key)
+		if sketch is None:
+			sketch = self._sketches[key] = TDigest()
+		accepted = 0
+		now = time.time()
+		for p in prices:
+			if p and p > 0 and not self.is_outlier(key, p):
+				sketch.add(p, now)
+				accepted += 1
+		if accepted:
+			self._dirty = True
+		return accepted
+
+	def recommend(self, key: str, current_prices: Iterable[float], undercut: float = 0.02, minimum: float = 0.0) -> Optional[dict]:
+		"""Рекомендация цены: чуть ниже самого дешёвого правдоподобного лота, но не ниже p10 рынка
+		и minimum. Выше опорной цены рекомендация не поднимается.
+
+		Возвращает { 'recommended', 'anchor', 'p10', 'median', 'rejected' } или None.
+		"""
+		prices = [p for p in current_prices if p and p > 0]
+		credible = [p for p in prices if not self.is_outlier(key, p)]
+		sketch = self._sketches.get(key)
+		p10 = median = None
+		if sketch and sketch.count >= self.MIN_COUNT:
+			p10, median = sketch.quantile(0.10), sketch.quantile(0.5)
+		if not credible and p10 is None:
+			return None
+		anchor = min(credible) if credible else p10
+		recommended = max(anchor * (1 - undercut), p10 or 0.0, minimum)
+		recommended = min(recommended, anchor)
+		return {
+			"recommended": recommended,
+			"anchor": anchor,
+			"p10": p10,
+			"median": median,
+			"rejected": len(prices) - len(credible),
+		}
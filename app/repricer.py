@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional
+
+from .atomic_io import dump_json
+from .config import config
+from .lot_index import detect_binding
+from .price_sketch import PriceSketches
+
+
+def parse_floors(raw: str) -> Dict[str, float]:
+	"""'князь:250,герцог:400' -> {'князь': 250.0, 'герцог': 400.0}"""
+	floors = {}
+	for part in (raw or "").split(","):
+		if ":" not in part:
+			continue
+		tier, value = part.split(":", 1)
+		try:
+			floors[tier.strip().lower()] = float(value.strip().replace(",", "."))
+		except ValueError:
+			continue
+	return floors
+
+
+class Repricer:
+	"""Автоподстройка цен наших лотов аккаунтов под самый дешёвый лот конкурента.
+
+	Цель: на step дешевле конкурента того же доната и привязки, но не ниже floor
+	(без floor — не ниже p10 скетча цен; без обоих лот не трогаем). Выбросы по
+	скетчу (троллинговые лоты за 1 ₽) конкурентами не считаются.
+	Лот трогаем, только если изменилась его позиция (цена конкурента или наша цена)
+	с прошлого цикла — большой ассортимент стоит лишь несколько операций со страницами.
+	"""
+
+	CATEGORY = 221
+
+	def __init__(self, client) -> None:
+		self._client = client
+		self._path = config.reprice_state_path
+		self.step: float = config.reprice_step
+		self.floors: Dict[str, float] = parse_floors(config.reprice_floors)
+		# offer_id -> [цена конкурента, наша цена, донат] на момент последней проверки
+		self._positions: Dict[str, list] = {}
+		self._load()
+
+	def _load(self) -> None:
+		try:
+			if os.path.exists(self._path):
+				with open(self._path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+				# Записи старого формата [конкурент, наша цена] без доната отбрасываем — лот пересчитается
+				self._positions = {
+					k: v for k, v in data.get("positions", {}).items()
+					if isinstance(v, list) and len(v) == 3
+				}
+				self.floors.update(data.get("floors", {}))
+		except Exception as e:
+			print(f"[Reprice] Ошибка загрузки состояния: {e}")
+
+	def save(self) -> None:
+		try:
+			dump_json(self._path, {"positions": self._positions, "floors": self.floors}, ensure_ascii=False, indent=2)
+		except Exception as e:
+			print(f"[Reprice] Ошибка сохранения состояния: {e}")
+
+	def set_floor(self, tier: str, price: float) -> None:
+		self.floors[tier.lower()] = price
+		# Правила изменились — пересчитаем все лоты этого доната
+		self._positions = {k: v for k, v in self._positions.items() if v[2] != tier.lower()}
+		self.save()
+
+	def plan(self, offers: List[dict], index, sketches: Optional[PriceSketches] = None) -> List[dict]:
+		"""Список изменений [{ 'offer', 'competitor', 'new_price' }] для лотов, чья позиция изменилась"""
+		own_ids = {o["offer_id"] for o in offers}
+		changes = []
+		unguarded = set()
+		for offer in offers:
+			tier = offer.get("tier")
+			if not tier:
+				continue
+			key = PriceSketches.key(self.CATEGORY, config.market_server, tier)
+			sketch = sketches.get(key) if sketches else None
+			p10 = sketch.quantile(0.10) if sketch and sketch.count >= PriceSketches.MIN_COUNT else None
+			floor = self.floors.get(tier, p10)
+			if floor is None:
+				# Ни floor, ни статистики рынка — снижать цену не на что опереться
+				unguarded.add(tier)
+				continue
+			binding = detect_binding(offer["description"])
+			competitor = index.cheapest_excluding(
+				tier, "any" if binding == "unknown" else binding, own_ids,
+				accept=(lambda price: not sketches.is_outlier(key, price)) if sketches else None,
+			)
+			position = [competitor["price"] if competitor else None, offer["price"], tier]
+			if self._positions.get(offer["offer_id"]) == position:
+				continue
+			self._positions[offer["offer_id"]] = position
+			if not competitor:
+				continue
+			target = max(round(competitor["price"] - self.step), floor, 1)
+			if abs(target - offer["price"]) >= 1:
+				changes.append({"offer": offer, "competitor": competitor, "new_price": target})
+		if unguarded:
+			print(f"[Reprice] Пропущены донаты без floor и статистики цен: {', '.join(sorted(unguarded))}")
+		return changes
+
+	async def run_cycle(self, apply: bool = True) -> List[dict]:
+		"""Один цикл: свои лоты (одна загрузка) + индекс последнего обхода -> изменения цен"""
+		offers = await self._client.fetch_own_offers(self.CATEGORY)
+		if offers is None:
+			return []
+		index = await self._client.account_index()
+		positions_before = dict(self._positions)
+		changes = self.plan(offers, index, self._client.price_sketches)
+		if not apply:
+			# Пробный прогон не должен "съедать" изменения позиций
+			self._positions = positions_before
+			return changes
+		for change in changes:
+			offer = change["offer"]
+			ok = await self._client.update_offer_price(self.CATEGORY, offer["offer_id"], change["new_price"])
+			change["applied"] = ok
+			if ok:
+				self._positions[offer["offer_id"]][1] = change["new_price"]
+			else:
+				# Повторим попытку в следующем цикле
+				self._positions.pop(offer["offer_id"], None)
+		self.save()
+		return changes
+
+	async def run(self) -> None:
+		print(f"[Reprice] Запущена автоподстройка цен (интервал {config.reprice_interval_sec} сек, шаг {self.step:g} ₽)")
+		while True:
+			await self._client.wait_logged_in()
+			changes = await self.run_cycle()
+			applied = [c for c in changes if c.get("applied")]
+			if applied:
+				await self._client.notify(self.format_changes(applied, "🔁 Цены обновлены"))
+			await asyncio.sleep(config.reprice_interval_sec)
+
+	@staticmethod
+	def format_changes(changes: List[dict], title: str) -> str:
+		if not changes:
+			return f"{title}: изменений нет — позиции не менялись"
+		lines = [f"{title}: {len(changes)}"]
+		for c in changes:
+			offer = c["offer"]
+			lines.append(
+				f"• {(offer.get('tier') or '').capitalize()} #{offer['offer_id']}: {offer['price']:g} → {c['new_price']:g} ₽ "
+				f"(конкурент {c['competitor']['price']:g} ₽)"
+			)
+		return "\n".join(lines)
@@ -1,2 +1,365 @@
-# Зарезервировано для будущих планировщиков задач
-# На текущем этапе логика периодического постинга находится внутри FunPayClient
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .atomic_io import dump_json
+
+
+# Фоновые задачи, работающие поверх FunPayClient.
+# Их циклы run() запускает и перезапускает при падении TaskSupervisor клиента.
+# Автопостинг и автоответ по-прежнему находятся внутри FunPayClient.
+
+
+class RateBudget:
+	"""Общий бюджет загрузок страниц FunPay (token bucket): не больше per_minute в минуту"""
+
+	def __init__(self, per_minute: int, burst: int = 3) -> None:
+		self._rate = max(1, per_minute) / 60.0
+		self._capacity = float(max(1, min(burst, per_minute)))
+		self._tokens = self._capacity
+		self._ts = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	async def acquire(self) -> None:
+		async with self._lock:
+			while True:
+				now = time.monotonic()
+				self._tokens = min(self._capacity, self._tokens + (now - self._ts) * self._rate)
+				self._ts = now
+				if self._tokens >= 1:
+					self._tokens -= 1
+					return
+				await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class TaskSupervisor:
+	"""Владеет фоновыми корутинами клиента.
+
+	Циклы, запущенные через start(), при падении перезапускаются с экспоненциальной
+	задержкой; stop() отменяет их сразу, не дожидаясь конца очередного sleep в цикле.
+	Разовые задачи (spawn) хранятся до завершения, их ошибки печатаются.
+	"""
+
+	def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0) -> None:
+		self._base_delay = base_delay
+		self._max_delay = max_delay
+		self._tasks: Dict[str, asyncio.Task] = {}
+		self._states: Dict[str, dict] = {}
+		self._oneshots: set = set()
+
+	def running(self, name: str) -> bool:
+		task = self._tasks.get(name)
+		return task is not None and not task.done()
+
+	def start(self, name: str, factory: Callable[[], Awaitable]) -> None:
+		if self.running(name):
+			return
+		self._states[name] = {"state": "running", "restarts": 0, "last_error": None}
+		self._tasks[name] = asyncio.create_task(self._supervise(name, factory))
+
+	def spawn(self, coro) -> asyncio.Task:
+		task = asyncio.create_task(coro)
+		self._oneshots.add(task)
+		task.add_done_callback(self._oneshot_done)
+		return task
+
+	def _oneshot_done(self, task: asyncio.Task) -> None:
+		self._oneshots.discard(task)
+		if not task.cancelled() and task.exception() is not None:
+			print(f"[Tasks] Фоновая задача завершилась ошибкой: {task.exception()!r}")
+
+	def states(self) -> Dict[str, dict]:
+		"""{ имя: { 'state': running|backoff|done|stopped, 'restarts', 'last_error' } }"""
+		return {name: dict(state) for name, state in self._states.items()}
+
+	async def _supervise(self, name: str, factory: Callable[[], Awaitable]) -> None:
+		state = self._states[name]
+		delay = self._base_delay
+		while True:
+			started = time.monotonic()
+			state["state"] = "running"
+			try:
+				await factory()
+				state["state"] = "done"
+				return
+			except asyncio.CancelledError:
+				state["state"] = "stopped"
+				raise
+			except Exception as e:
+				state["last_error"] = f"{e.__class__.__name__}: {e}"
+			# Долго проработавший цикл начинает отсчёт задержки заново
+			if time.monotonic() - started > self._max_delay:
+				delay = self._base_delay
+			state["restarts"] += 1
+			state["state"] = "backoff"
+			print(f"[Tasks] {name} упала ({state['last_error']}), перезапуск через {delay:.0f} сек")
+			try:
+				await asyncio.sleep(delay)
+			except asyncio.CancelledError:
+				state["state"] = "stopped"
+				raise
+			delay = min(delay * 2, self._max_delay)
+
+	async def stop(self, name: Optional[str] = None, timeout: float = 5.0, grace: float = 0.0) -> None:
+		"""Останавливает задачу name (или все задачи).
+
+		grace — сколько дать задачам завершиться самим (цикл выходит в безопасной
+		точке), после чего оставшиеся отменяются и ожидаются не дольше timeout.
+		"""
+		if name is None:
+			tasks = list(self._tasks.values()) + list(self._oneshots)
+		else:
+			tasks = [self._tasks[name]] if name in self._tasks else []
+		current = asyncio.current_task()
+		tasks = [t for t in tasks if not t.done() and t is not current]
+		if tasks and grace > 0:
+			await asyncio.wait(tasks, timeout=grace)
+			tasks = [t for t in tasks if not t.done()]
+		for task in tasks:
+			task.cancel()
+		if tasks:
+			await asyncio.wait(tasks, timeout=timeout)
+
+
+class MarketCrawler:
+	"""Фоновый обход списков лотов: аккаунты (221), услуги (223), валюта (1596).
+
+	Результаты сохраняются клиентом в историю рынка и в последний снимок,
+	поэтому анализ в Telegram отвечает сразу, без живого парсинга.
+	"""
+
+	CATEGORIES: Tuple[int, ...] = (221, 223, 1596)
+
+	def __init__(self, client, interval_sec: int, categories: Tuple[int, ...] = CATEGORIES) -> None:
+		self._client = client
+		self._interval = max(10, interval_sec)
+		self._categories = categories
+
+	async def crawl(self, category: int) -> Optional[dict]:
+		await self._client.rate_budget.acquire()
+		started = time.monotonic()
+		diff = await self._client.crawl_listing(category)
+		print(f"[Crawler] lots/{category}/ обновлён за {time.monotonic() - started:.1f} сек")
+		return diff
+
+	async def run(self) -> None:
+		print(f"[Crawler] Запущен обход рынка {list(self._categories)} (интервал {self._interval} сек)")
+		while True:
+			for category in self._categories:
+				try:
+					await self.crawl(category)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					print(f"[Crawler] Ошибка обхода lots/{category}/: {e}")
+			await asyncio.sleep(self._interval)
+
+
+class OrderWatcher:
+	"""Следит за оплаченными заказами (orders/trade?state=paid) и сообщает только о новых.
+
+	Уже виденные заказы хранятся в файле, поэтому после перезапуска старые
+	заказы повторно не присылаются. Флаг seeded в том же файле отмечает, что
+	первый проход (запоминание текущих заказов без уведомлений) уже был —
+	даже если тогда оплаченных заказов не нашлось.
+	"""
+
+	SEEN_TTL_SEC = 30 * 86400
+
+	def __init__(self, client, interval_sec: int, path: str) -> None:
+		self._client = client
+		self._interval = max(5, interval_sec)
+		self._path = path
+		self._seen: Dict[str, float] = {}  # order_id -> когда впервые увидели
+		self._seeded = False
+		self._reported: set = set()  # Заказы из чата, замеченные до первого прохода (только в памяти)
+		self._listeners: List[Callable[[dict], Awaitable[None]]] = []
+		self._load()
+
+	def add_listener(self, callback: Callable[[dict], Awaitable[None]]) -> None:
+		"""Коллбэк, вызываемый для каждого нового оплаченного заказа"""
+		self._listeners.append(callback)
+
+	def _load(self) -> None:
+		try:
+			if os.path.exists(self._path):
+				with open(self._path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+				if isinstance(data.get("seen"), dict):
+					self._seen = data["seen"]
+					self._seeded = bool(data.get("seeded"))
+				else:
+					# Старый формат: просто словарь заказов, записанный после первого прохода
+					self._seen = data
+					self._seeded = True
+		except Exception as e:
+			print(f"[Orders] Ошибка загрузки виденных заказов: {e}")
+
+	def save(self) -> None:
+		"""Пишет файл только после первого прохода: до него запись создала бы файл,
+		по которому следующий запуск решит, что проход уже был"""
+		if not self._seeded:
+			return
+		try:
+			dump_json(self._path, {"seeded": self._seeded, "seen": self._seen})
+		except Exception as e:
+			print(f"[Orders] Ошибка сохранения виденных заказов: {e}")
+
+	def diff(self, orders: List[dict]) -> List[dict]:
+		"""Новые заказы относительно виденных; запоминает их"""
+		now = time.time()
+		new = [o for o in orders if o["order_id"] not in self._seen]
+		for order in new:
+			self._seen[order["order_id"]] = now
+		expired = [k for k, ts in self._seen.items() if now - ts > self.SEEN_TTL_SEC]
+		for key in expired:
+			del self._seen[key]
+		if new or expired:
+			self.save()
+		return new
+
+	async def check(self) -> List[dict]:
+		"""Одна проверка: перезагрузка списка оплаченных заказов и рассылка новых"""
+		await self._client.rate_budget.acquire()
+		orders = await self._client.fetch_paid_orders()
+		if orders is None:
+			return []
+		new = self.diff(orders)
+		if not self._seeded:
+			# Первый запуск: текущие заказы уже не новые, только запоминаем.
+			# Сохраняем и пустой набор, иначе первый настоящий заказ тоже "запомнится"
+			self._seeded = True
+			# Заказы, уже разосланные по сообщению в чате, тоже считаем виденными
+			for order_id in self._reported:
+				self._seen.setdefault(order_id, time.time())
+			self._reported.clear()
+			self.save()
+			print(f"[Orders] Запомнено {len(new)} текущих оплаченных заказов")
+			return []
+		for order in new:
+			await self._dispatch(order)
+		return new
+
+	async def report(self, order: dict) -> bool:
+		"""Заказ, замеченный в другом месте (например, в чате); False — он уже обработан"""
+		if not self._seeded:
+			# До первого прохода файл не трогаем: иначе проход решит, что он уже был,
+			# и разошлёт все текущие оплаченные заказы как новые
+			if order["order_id"] in self._reported:
+				return False
+			self._reported.add(order["order_id"])
+		elif not self.diff([order]):
+			return False
+		await self._dispatch(order)
+		return True
+
+	async def _dispatch(self, order: dict) -> None:
+		order.setdefault("detected_at", time.time())
+		print(f"[Orders] Новый заказ {order['order_id']} от {order.get('buyer') or '?'}")
+		for callback in self._listeners:
+			try:
+				await callback(order)
+			except Exception as e:
+				print(f"[Orders] Ошибка обработки заказа {order['order_id']}: {e}")
+
+	async def run(self) -> None:
+		print(f"[Orders] Запущено отслеживание новых заказов (интервал {self._interval} сек)")
+		while True:
+			await self._client.wait_logged_in()
+			await self.check()
+			await asyncio.sleep(self._interval)
+
+
+class BalanceMonitor:
+	"""Периодически обновляет баланс на вкладке финансов и сообщает об изменениях"""
+
+	def __init__(self, client, interval_sec: int) -> None:
+		self._client = client
+		self._interval = max(10, interval_sec)
+		self._last: Optional[str] = None
+
+	async def run(self) -> None:
+		print(f"[Balance] Запущен мониторинг баланса (интервал {self._interval} сек)")
+		while True:
+			await self._client.wait_logged_in()
+			await self._client.rate_budget.acquire()
+			balance = await self._client.refresh_balance()
+			if balance and balance != self._last:
+				if self._last is not None:
+					await self._client.notify(f"💰 Баланс изменился: {self._last} → {balance}")
+				self._last = balance
+			await asyncio.sleep(self._interval)
+
+
+class AuthMonitor:
+	"""Периодическая дешёвая проверка авторизации FunPay.
+
+	При истечении сессии фоновые циклы клиента встают на паузу
+	(FunPayClient.wait_logged_in), а администратор получает уведомление.
+	"""
+
+	def __init__(self, client, interval_sec: int) -> None:
+		self._client = client
+		self._interval = max(10, interval_sec)
+
+	async def check(self) -> bool:
+		ok = await self._client.probe_auth()
+		previous = self._client.logged_in
+		self._client.set_auth_state(ok)
+		if previous is not None and ok != previous:
+			if ok:
+				print("[Auth] Сессия FunPay восстановлена")
+				await self._client.notify("✅ Сессия FunPay восстановлена, фоновые задачи продолжают работу")
+			else:
+				print("[Auth] Сессия FunPay истекла")
+				await self._client.notify("⚠️ Сессия FunPay истекла — фоновые задачи на паузе. Войдите заново: 🔐 Войти FunPay")
+		elif previous is None and not ok:
+			print("[Auth] Нет авторизации FunPay — фоновые задачи на паузе")
+		return ok
+
+	async def run(self) -> None:
+		while True:
+			await self.check()
+			await asyncio.sleep(self._interval)
+
+
+class TabHealthMonitor:
+	"""Следит за памятью долгоживущих вкладок (чаты, услуги) через CDP Performance.getMetrics.
+
+	Вкладка, превысившая порог JS heap, числа DOM-узлов или возраста, помечается
+	к пересозданию; сам перезапуск делает клиент между итерациями своих циклов.
+	"""
+
+	def __init__(self, client, interval_sec: int, max_heap_mb: int = 0, max_nodes: int = 0, max_age_hours: int = 0) -> None:
+		self._client = client
+		self._interval = max(30, interval_sec)
+		self._max_heap_mb = max_heap_mb
+		self._max_nodes = max_nodes
+		self._max_age_sec = max_age_hours * 3600
+
+	def recycle_reason(self, heap_mb: float, nodes: float, age_sec: float) -> Optional[str]:
+		if self._max_heap_mb and heap_mb > self._max_heap_mb:
+			return f"JS heap {heap_mb:.0f} МБ"
+		if self._max_nodes and nodes > self._max_nodes:
+			return f"{nodes:.0f} DOM-узлов"
+		if self._max_age_sec and age_sec > self._max_age_sec:
+			return f"возраст {age_sec / 3600:.1f} ч"
+		return None
+
+	async def check(self) -> None:
+		for slot, page in self._client.long_lived_tabs().items():
+			metrics = await self._client.page_metrics(page)
+			heap_mb = metrics.get("JSHeapUsedSize", 0) / (1024 * 1024)
+			nodes = metrics.get("Nodes", 0)
+			reason = self.recycle_reason(heap_mb, nodes, self._client.tab_age(page))
+			if reason:
+				print(f"[Tabs] Вкладка {slot} будет пересоздана: {reason}")
+				self._client.request_tab_recycle(slot)
+
+	async def run(self) -> None:
+		print(f"[Tabs] Запущен контроль памяти вкладок (интервал {self._interval} сек)")
+		while True:
+			await asyncio.sleep(self._interval)
+			await self.check()
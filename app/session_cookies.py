@@ -0,0 +1,17 @@
+import json
+from pathlib import Path
+
+
+async def import_session_cookies(context, storage_path: str, base_url: str = "https://funpay.com/") -> bool:
+	"""Переносит cookies сохранённой сессии (storage_state) в контекст браузера, если в нём нет входа.
+
+	Возвращает True, если cookies были перенесены. Ошибки чтения файла пробрасываются вызывающему.
+	"""
+	if not Path(storage_path).exists():
+		return False
+	cookies = await context.cookies(base_url)
+	if any(c["name"] == "golden_key" for c in cookies):
+		return False
+	state = json.loads(Path(storage_path).read_text(encoding="utf-8"))
+	await context.add_cookies(state.get("cookies", []))
+	return True
@@ -8,6 +8,7 @@ from typing import Optional
 
 from .config import config
 from .funpay_client import FunPayClient
+from .parsers import TIER_PATTERNS
 
 
 def build_menu() -> ReplyKeyboardMarkup:
@@ -59,14 +60,27 @@ class Controller:
 		except Exception as e:
 			print(f"[Telegram] Ошибка отправки скриншота: {e}")
 
+	async def send_alert_to_admin(self, text: str) -> None:
+		"""Отправляет администратору уведомление о сработавшем правиле цен"""
+		try:
+			admin_id = self._admin_id_ref("get")
+			if admin_id == 0:
+				return
+			await self._bot.send_message(chat_id=admin_id, text=text, disable_web_page_preview=True)
+		except Exception as e:
+			print(f"[Telegram] Ошибка отправки уведомления: {e}")
+
 	async def cmd_start(self, message: Message) -> None:
 		admin_id = self._admin_id_ref("get")
 		if admin_id == 0 and message.from_user:
 			admin_id = message.from_user.id
 			self._admin_id_ref("set", admin_id)
 			await message.answer("Вы назначены администратором этого бота.")
+		status = "⏳ Браузер FunPay запускается..." if self.client.starting else (
+			"✅ Браузер FunPay готов" if self.client.ready else f"❌ Браузер FunPay не запущен: {self.client.launch_error}"
+		)
 		await message.answer(
-			"Меню управления FunPay ботом:",
+			f"Меню управления FunPay ботом:\n{status}",
 			reply_markup=build_menu(),
 		)
 
@@ -91,8 +105,15 @@ class Controller:
 					f"\n• Оплачено: {trade['paid_count']} на {trade['paid_sum']} ₽"\
 					f"\n• Закрыто: {trade['closed_count']} на {trade['closed_sum']} ₽"\
 					f"\n• Возвраты: {trade['refund_count']} на {trade['refund_sum']} ₽"\
-					f"\nИтого по списку: {trade['total_sum']} ₽"
+					f"\nИтого за всё время: {trade['total_sum']} ₽"\
+					f"\nЗа этот месяц: {trade['month_count']} на {trade['month_sum']} ₽"
+					+ ("" if trade["synced"] else "\n⏳ История продаж ещё загружается, итоги неполные")
 				)
+				buyers = self.client.top_buyers()
+				if buyers:
+					parts.append("Постоянные покупатели:\n" + "\n".join(
+						f"• {b['buyer']}: {b['count']} на {b['sum']:g} ₽" for b in buyers
+					))
 			if active:
 				lines = ["\nОткрытые (Оплачен):"]
 				for o in active:
@@ -587,6 +608,120 @@ class Controller:
 		except Exception as e:
 			await callback_query.message.edit_text(f"❌ Ошибка анализа: {e}")
 
+	async def cmd_trend(self, message: Message) -> None:
+		"""Тренд цен на аккаунты из локальной истории рынка"""
+		parts = (message.text or "").split(maxsplit=1)
+		donate_name = parts[1].strip().lower() if len(parts) > 1 else None
+		await message.answer(self.client.market_trend(donate_name))
+
+	async def cmd_watch(self, message: Message) -> None:
+		"""Добавить правило: /watch князь без 300 или /watch валюта 0.5"""
+		parts = (message.text or "").split()[1:]
+		usage = (
+			"Использование:\n/watch [донат] [с|без|утер] цена — аккаунты дешевле цены\n"
+			"/watch валюта цена — валюта FunTime дешевле цены за 1кк\n\n"
+			"Пример: /watch князь без 300"
+		)
+		try:
+			max_price = float(parts[-1].replace(",", "."))
+		except (IndexError, ValueError):
+			await message.answer(usage)
+			return
+		args = [p.lower() for p in parts[:-1]]
+		if args and args[0] == "валюта":
+			rule = self.client.alerts.add(1596, max_price, server=config.market_server)
+		else:
+			binding_map = {"с": "with", "без": "without", "утер": "lost", "утерянная": "lost"}
+			tiers = [name for name, _, _ in TIER_PATTERNS]
+			binding = "any"
+			tier = None
+			for arg in args:
+				if arg in binding_map:
+					binding = binding_map[arg]
+				elif arg in tiers:
+					tier = arg
+				elif arg != "навсегда":  # "князь навсегда" — часть названия доната
+					await message.answer(f"❌ Неизвестный донат: {arg}. Доступны: {', '.join(tiers)}\n\n{usage}")
+					return
+			rule = self.client.alerts.add(221, max_price, tier=tier, binding=binding, server=config.market_server)
+		await message.answer(f"✅ Правило добавлено: {rule.describe()}")
+
+	async def cmd_watches(self, message: Message) -> None:
+		"""Список правил наблюдения"""
+		rules = self.client.alerts.rules
+		if not rules:
+			await message.answer("Правил нет. Добавьте: /watch князь без 300")
+			return
+		await message.answer("🔔 Правила наблюдения:\n" + "\n".join(r.describe() for r in rules))
+
+	async def cmd_unwatch(self, message: Message) -> None:
+		"""Удалить правило по номеру"""
+		parts = (message.text or "").split()
+		try:
+			rule_id = int(parts[1].lstrip("#"))
+		except (IndexError, ValueError):
+			await message.answer("Использование: /unwatch номер_правила")
+			return
+		removed = self.client.alerts.remove(rule_id)
+		await message.answer("✅ Правило удалено" if removed else "❌ Нет такого правила")
+
+	async def cmd_export(self, message: Message) -> None:
+		"""Выгрузка всей истории продаж: /export [csv|jsonl]"""
+		parts = (message.text or "").split()
+		fmt = parts[1].lower() if len(parts) > 1 else "csv"
+		if fmt not in ("csv", "jsonl"):
+			await message.answer("Использование: /export [csv|jsonl]")
+			return
+		await message.answer("📤 Выгружаю историю продаж постранично, это может занять несколько минут...")
+		try:
+			result = await self.client.export_orders(fmt)
+		except Exception as e:
+			await message.answer(f"❌ Ошибка выгрузки: {e}\nПовторите /export {fmt} — выгрузка продолжится с места остановки")
+			return
+		if not result:
+			await message.answer("❌ Браузер не запущен")
+			return
+		caption = f"📦 Заказов: {result['rows']} ({result['pages']} стр.)" + (" — продолжено после обрыва" if result["resumed"] else "")
+		await message.answer_document(FSInputFile(result["path"]), caption=caption)
+
+	async def cmd_reprice(self, message: Message) -> None:
+		"""Пробный прогон автоподстройки цен: что бы изменилось сейчас"""
+		await message.answer("🔍 Сравниваю наши лоты с конкурентами...")
+		changes = await self.client.repricer.run_cycle(apply=False)
+		await message.answer(self.client.repricer.format_changes(changes, "Предлагаемые изменения"))
+
+	async def cmd_reprice_on(self, message: Message) -> None:
+		"""Включить автоподстройку цен"""
+		self.client.tasks.start("repricer", self.client.repricer.run)
+		floors = ", ".join(f"{k}: {v:g} ₽" for k, v in self.client.repricer.floors.items()) or "не заданы"
+		await message.answer(f"✅ Автоподстройка цен включена\nШаг: {self.client.repricer.step:g} ₽\nМинимумы: {floors}")
+
+	async def cmd_reprice_off(self, message: Message) -> None:
+		"""Выключить автоподстройку цен"""
+		await self.client.tasks.stop("repricer")
+		await message.answer("⏹ Автоподстройка цен выключена")
+
+	async def cmd_reprice_floor(self, message: Message) -> None:
+		"""Минимальная цена для доната: /reprice_floor князь 250"""
+		parts = (message.text or "").split()
+		try:
+			tier, price = parts[1].lower(), float(parts[2].replace(",", "."))
+		except (IndexError, ValueError):
+			await message.answer("Использование: /reprice_floor донат цена\nПример: /reprice_floor князь 250")
+			return
+		self.client.repricer.set_floor(tier, price)
+		await message.answer(f"✅ Минимальная цена для {tier}: {price:g} ₽")
+
+	async def cmd_market(self, message: Message) -> None:
+		"""Состояние фонового обхода рынка"""
+		names = {221: "Аккаунты", 223: "Услуги", 1596: "Валюта"}
+		ages = self.client.snapshot_ages()
+		lines = [f"Обход рынка: {'работает 🟢' if self.client.tasks.running('crawler') else 'остановлен 🔴'}"]
+		for category, name in names.items():
+			age = ages.get(category)
+			lines.append(f"• {name} ({category}): " + (f"{age:.0f} сек назад" if age is not None else "ещё нет данных"))
+		await message.answer("\n".join(lines))
+
 	async def cmd_analyze_lot(self, message: Message) -> None:
 		"""Анализ конкретного лота по ссылке"""
 		# Извлекаем URL из сообщения
@@ -697,7 +832,13 @@ class Controller:
 		status = "включён ✅" if config.auto_reply_enabled else "выключен ❌"
 		text = config.auto_reply_text[:50] + "..." if len(config.auto_reply_text) > 50 else config.auto_reply_text
 		running = "работает 🟢" if self.client.running else "остановлен 🔴"
-		await message.answer(f"Автоответ: {status}\nБот: {running}\nТекст: {text}")
+		lines = [f"Автоответ: {status}", f"Бот: {running}", f"Текст: {text}"]
+		for name, state in self.client.tasks.states().items():
+			line = f"• {name}: {state['state']}, перезапусков {state['restarts']}"
+			if state["last_error"]:
+				line += f" (последняя ошибка: {state['last_error'][:80]})"
+			lines.append(line)
+		await message.answer("\n".join(lines))
 
 	async def cmd_help(self, message: Message) -> None:
 		"""Показать список всех команд"""
@@ -744,6 +885,23 @@ class Controller:
 /analyze_currency - Анализ цен на валюту Minecraft
 /analyze_accounts - Анализ аккаунтов (покупка/продажа)
 /analyze_lot - Анализ конкретного лота по ссылке
+/trend [донат] - Тренд цен из истории рынка (без парсинга)
+/market - Свежесть данных фонового обхода рынка
+
+**🔔 Уведомления о ценах:**
+/watch [донат] [с|без|утер] цена - Уведомить о лоте дешевле цены
+/watch валюта цена - Уведомить о валюте дешевле цены за 1кк
+/watches - Список правил
+/unwatch [номер] - Удалить правило
+
+**📤 Выгрузка:**
+/export [csv|jsonl] - Вся история продаж файлом
+
+**🔁 Автоподстройка цен наших лотов:**
+/reprice - Пробный прогон (что изменится)
+/reprice_on - Включить автоподстройку
+/reprice_off - Выключить автоподстройку
+/reprice_floor [донат] [цена] - Минимальная цена для доната
 
 **🤖 Тестирование:**
 /test - Тест Groq (Llama) - нужен API ключ
@@ -792,20 +950,36 @@ async def run_telegram(client: FunPayClient) -> None:
 	
 	# Устанавливаем коллбэк для отправки скриншотов
 	client.set_screenshot_callback(controller.send_screenshot_to_admin)
-
-	def only_admin(handler):
+	client.set_alert_callback(controller.send_alert_to_admin)
+
+	async def browser_ready(message: Message) -> bool:
+		"""Команды, которым нужен браузер, ждут окончания его запуска"""
+		if client.ready:
+			return True
+		if client.retry_launch():
+			await message.answer("🔄 Прошлый запуск браузера не удался, пробую снова...")
+		if client.starting:
+			await message.answer("⏳ Браузер FunPay запускается, команда выполнится сразу после запуска...")
+			if await client.wait_ready(config.browser_ready_timeout_sec):
+				return True
+		await message.answer(f"❌ Браузер FunPay не запущен: {client.launch_error or 'время ожидания истекло'}")
+		return False
+
+	def only_admin(handler, needs_browser: bool = True):
 		async def wrapper(message: Message, *args, **kwargs):
 			current_admin = admin_id_ref("get")
 			if current_admin == 0 and message.text and message.text.startswith("/start"):
 				return await handler(message)
 			if message.from_user and message.from_user.id == current_admin:
+				if needs_browser and not await browser_ready(message):
+					return
 				return await handler(message)
 			await message.answer("Доступ запрещён")
 		return wrapper
 
 	# Команды сначала
-	dp.message.register(only_admin(controller.cmd_start), Command("start"))
-	dp.message.register(only_admin(controller.cmd_help), Command("help"))
+	dp.message.register(only_admin(controller.cmd_start, needs_browser=False), Command("start"))
+	dp.message.register(only_admin(controller.cmd_help, needs_browser=False), Command("help"))
 	dp.message.register(only_admin(controller.cmd_text), Command("text"))
 	dp.message.register(only_admin(controller.cmd_interval), Command("interval"))
 	dp.message.register(only_admin(controller.cmd_services_interval), Command("services_interval"))
@@ -826,6 +1000,16 @@ async def run_telegram(client: FunPayClient) -> None:
 	dp.message.register(only_admin(controller.cmd_analyze_currency), Command("analyze_currency"))
 	dp.message.register(only_admin(controller.cmd_analyze_accounts), Command("analyze_accounts"))
 	dp.message.register(only_admin(controller.cmd_analyze_lot), Command("analyze_lot"))
+	dp.message.register(only_admin(controller.cmd_trend, needs_browser=False), Command("trend"))
+	dp.message.register(only_admin(controller.cmd_market), Command("market"))
+	dp.message.register(only_admin(controller.cmd_watch, needs_browser=False), Command("watch"))
+	dp.message.register(only_admin(controller.cmd_watches, needs_browser=False), Command("watches"))
+	dp.message.register(only_admin(controller.cmd_unwatch, needs_browser=False), Command("unwatch"))
+	dp.message.register(only_admin(controller.cmd_export), Command("export"))
+	dp.message.register(only_admin(controller.cmd_reprice), Command("reprice"))
+	dp.message.register(only_admin(controller.cmd_reprice_on), Command("reprice_on"))
+	dp.message.register(only_admin(controller.cmd_reprice_off), Command("reprice_off"))
+	dp.message.register(only_admin(controller.cmd_reprice_floor), Command("reprice_floor"))
 	dp.message.register(only_admin(controller.cmd_test), Command("test"))
 	
 	# Обработчики кнопок анализа
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from playwright.async_api import async_playwright
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.session_cookies import import_session_cookies
+
+load_dotenv()
+
+# Долгоживущий Chromium для бота: бот подключается к нему по CDP (BROWSER_CDP_URL)
+# и при перезапуске получает тот же браузер с кэшем, cookies и открытыми вкладками.
+CDP_PORT = int(os.getenv("BROWSER_DAEMON_PORT", "9222"))
+PROFILE_DIR = os.getenv("BROWSER_DAEMON_PROFILE", "storage/browser_profile")
+STORAGE_PATH = os.getenv("FUNPAY_STORAGE_PATH", "storage/funpay.json")
+HEADLESS = os.getenv("HEADLESS", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+
+async def main() -> None:
+	Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+	pw = await async_playwright().start()
+	context = await pw.chromium.launch_persistent_context(
+		PROFILE_DIR,
+		headless=HEADLESS,
+		args=[
+			f"--remote-debugging-port={CDP_PORT}",
+			"--remote-debugging-address=127.0.0.1",
+			"--disable-blink-features=AutomationControlled",
+			"--disable-dev-shm-usage",
+			"--no-sandbox",
+		],
+		viewport={"width": 1920, "height": 1080},
+		user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+		locale="ru-RU",
+		timezone_id="Europe/Moscow",
+	)
+	# Первый запуск профиля: перенесём cookies сохранённой сессии
+	try:
+		if await import_session_cookies(context, STORAGE_PATH):
+			print(f"Cookies из {STORAGE_PATH} перенесены в профиль")
+	except Exception as e:
+		print(f"Не удалось перенести cookies: {e}")
+	print(f"Браузер запущен. В .env бота укажите BROWSER_CDP_URL=http://127.0.0.1:{CDP_PORT}")
+	print("Для остановки нажмите Ctrl+C")
+	try:
+		await asyncio.Event().wait()
+	finally:
+		await context.close()
+		await pw.stop()
+
+
+if __name__ == "__main__":
+	try:
+		asyncio.run(main())
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import config
+from app.export import EXPORT_FORMATS, export_orders
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description="Выгрузка всей истории продаж FunPay в CSV/JSONL")
+	parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+	parser.add_argument("--output", help="Файл выгрузки (по умолчанию storage/exports/orders.<формат>)")
+	args = parser.parse_args()
+
+	if not Path(config.storage_path).exists():
+		print(f"Сессия {config.storage_path} не найдена — сначала выполните scripts/login_funpay.py")
+		return
+	target = args.output or os.path.join(config.export_dir, f"orders.{args.format}")
+
+	pw = await async_playwright().start()
+	browser = await pw.chromium.launch(headless=True)
+	context = await browser.new_context(storage_state=config.storage_path)
+	try:
+		result = await export_orders(context.request, target, args.format)
+		print(f"Готово: {result['rows']} заказов в {result['path']}")
+	except RuntimeError as e:
+		print(f"Выгрузка остановлена: {e}. Повторный запуск продолжит с того же места")
+	finally:
+		await browser.close()
+		await pw.stop()
+
+
+if __name__ == "__main__":
+	try:
+		asyncio.run(main())
+	except KeyboardInterrupt:
+		print("Прервано — повторный запуск продолжит выгрузку")
@@ -0,0 +1,33 @@
+import time
+
+from app.order_store import OrderStore
+
+
+def _store(tmp_path) -> OrderStore:
+	return OrderStore(str(tmp_path / "orders.sqlite3"))
+
+
+def test_upsert_fills_fields_missing_from_stored_row(tmp_path):
+	store = _store(tmp_path)
+	ts = time.mktime((2024, 10, 3, 14, 22, 0, 0, 0, -1))
+	assert store.upsert([{"order_id": "#A1", "status": "Оплачен", "amount": 100.0}]) == 1
+	# Та же запись, но теперь с покупателем и датой — это изменение, а не повтор
+	assert store.upsert([{"order_id": "#A1", "status": "Оплачен", "amount": 100.0, "buyer": "bob", "buyer_id": "7", "ts": ts}]) == 1
+	assert store.totals("buyer", "bob") == {"paid": {"count": 1, "sum": 100.0}}
+	assert store.totals("month", "2024-10") == {"paid": {"count": 1, "sum": 100.0}}
+
+	assert store.upsert([{"order_id": "#A1", "status": "Закрыт", "amount": 100.0}]) == 1
+	assert store.top_buyers() == [{"buyer": "bob", "count": 1, "sum": 100.0}]
+	assert store.totals("month", "2024-10")["closed"] == {"count": 1, "sum": 100.0}
+	assert store.totals()["paid"]["count"] == 0
+	assert store.totals()["closed"]["count"] == 1
+
+
+def test_upsert_unchanged_order_is_not_counted_twice(tmp_path):
+	store = _store(tmp_path)
+	order = {"order_id": "#B2", "status": "Оплачен", "amount": 50.0, "buyer": "alice", "ts": time.time()}
+	assert store.upsert([order]) == 1
+	# Повтор без части полей: сохранённые значения остаются, итоги не меняются
+	assert store.upsert([order, {"order_id": "#B2", "status": "Оплачен"}]) == 0
+	assert store.totals() == {"paid": {"count": 1, "sum": 50.0}}
+	assert store.totals("buyer", "alice") == {"paid": {"count": 1, "sum": 50.0}}